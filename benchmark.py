@@ -0,0 +1,560 @@
+# benchmark.py
+"""
+Benchmark for the analytics pipeline in main.py.
+
+Generates realistic users/subjects/exams/examresults documents from a seed
+for each class size, then times ingestion (load_data_from_mongo),
+preprocessing (PerformanceAnalyzer) and the /, /filter and /report routes.
+Prints JSON with per-stage latency, throughput and peak memory. Route stages
+render every request; the `*_cached` ones measure response cache hits.
+
+    python benchmark.py                         # mongomock: 500, 1k, 2k students
+    python benchmark.py --sizes 1000 --repeat 20 --output bench_output.txt
+    python benchmark.py --backend replay        # 1k, 10k, 100k students
+    python benchmark.py --mongo-uri mongodb://localhost:27017
+
+Backends:
+  mongomock  (default) runs the real pipelines in mongomock. $lookup is
+             quadratic there, so keep it to a few thousand students.
+  replay     client-side only: an in-memory stand-in that hands back rows
+             precomputed at generation time instead of executing the
+             pipelines. The numbers cover the Python side alone: cursor
+             draining, column buffers, pivot, preprocessing and rendering.
+  mongodb    a disposable local mongod (--mongo-uri). Its database is
+             dropped and re-seeded for every size.
+
+Ingest throughput counts the documents the pipeline returned (one per
+student and subject in AGGREGATION_MODE=server), not the seeded examresults.
+"""
+
+import argparse
+import datetime
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from bson import ObjectId
+
+import main
+
+try:  # Unix only: peak RSS per stage
+    import resource
+except ImportError:
+    resource = None
+
+# Class sizes benchmarked when --sizes is not given
+DEFAULT_SIZES = {
+    "mongomock": [500, 1000, 2000],
+    "replay": [1000, 10000, 100000],
+    "mongodb": [1000, 10000, 100000],
+}
+
+DEPARTMENTS = ["Computer Science", "Mathematics", "Physics", "Commerce"]
+SUBJECT_NAMES = [
+    "Data Structures",
+    "Algorithms",
+    "Operating Systems",
+    "Databases",
+    "Linear Algebra",
+    "Calculus",
+    "Mechanics",
+    "Accounting",
+    "Statistics",
+    "Networks",
+]
+FIRST_NAMES = ["Aisha", "Rahul", "Sara", "Imran", "Priya", "Omar", "Neha", "Arjun"]
+LAST_NAMES = ["Khan", "Sharma", "Ali", "Verma", "Siddiqui", "Gupta", "Iyer", "Das"]
+FEEDBACK = [
+    "Good understanding of the core concepts.",
+    "Revise the definitions and practice more numericals.",
+    "Answers lack structure; use headings and examples.",
+    "Excellent work, keep it up.",
+    "",
+]
+QUESTIONS_PER_EXAM = 5
+MARKS_PER_QUESTION = 10
+
+
+# --- Synthetic data ---
+def object_id(kind, index):
+    # Deterministic ids: same seed and size -> same documents on every backend
+    return ObjectId(f"{kind:04x}{index:020x}")
+
+
+class Dataset:
+    """
+    Seeded school: faculties, subjects, exams, and per-student examresults.
+    Each student's results come from their own RNG, so any student can be
+    regenerated on demand without keeping every document in memory.
+    """
+
+    def __init__(self, n_students, n_subjects, exams_per_subject, attempt_rate, seed):
+        self.n_students = n_students
+        self.attempt_rate = attempt_rate
+        self.seed = seed
+        start = datetime.datetime(2025, 7, 1)
+        self.faculties = [
+            {"_id": object_id(1, i), "department": DEPARTMENTS[i % len(DEPARTMENTS)]}
+            for i in range(max(n_subjects // 2, 1))
+        ]
+        self.subjects = [
+            {
+                "_id": object_id(2, i),
+                "name": SUBJECT_NAMES[i % len(SUBJECT_NAMES)]
+                + (
+                    f" {i // len(SUBJECT_NAMES) + 1}" if i >= len(SUBJECT_NAMES) else ""
+                ),
+                "code": f"SUB{i:03d}",
+                "faculty": self.faculties[i % len(self.faculties)]["_id"],
+            }
+            for i in range(n_subjects)
+        ]
+        self.exams = []
+        self._subject_of_exam = []
+        for s, subject in enumerate(self.subjects):
+            for j in range(exams_per_subject):
+                self.exams.append(
+                    {
+                        "_id": object_id(3, len(self.exams)),
+                        "title": f"{subject['name']} - Test {j + 1}",
+                        "subject": subject["_id"],
+                        "totalMarks": QUESTIONS_PER_EXAM * MARKS_PER_QUESTION,
+                        "createdAt": start + datetime.timedelta(weeks=3 * j),
+                    }
+                )
+                self._subject_of_exam.append(s)
+
+    def _rng(self, i):
+        return random.Random(self.seed * 1_000_003 + i)
+
+    def student(self, i):
+        rnd = self._rng(i)
+        return {
+            "_id": object_id(4, i),
+            "firstName": rnd.choice(FIRST_NAMES),
+            "lastName": f"{rnd.choice(LAST_NAMES)} {i}",
+            "role": "student",
+        }
+
+    def results(self, i):
+        """examresults documents for student i, as (exam position, document) pairs."""
+        rnd = self._rng(i)
+        # Per-student ability so scores are correlated across subjects
+        ability = rnd.betavariate(5, 3)
+        docs = []
+        for e, exam in enumerate(self.exams):
+            if rnd.random() > self.attempt_rate:
+                continue
+            questions = []
+            for q in range(QUESTIONS_PER_EXAM):
+                marks = round(rnd.gauss(ability * MARKS_PER_QUESTION, 2))
+                questions.append(
+                    {
+                        "question": q + 1,
+                        "maxMarks": MARKS_PER_QUESTION,
+                        "marks": min(MARKS_PER_QUESTION, max(0, marks)),
+                    }
+                )
+            obtained = sum(q["marks"] for q in questions)
+            submitted = exam["createdAt"] + datetime.timedelta(hours=rnd.randint(1, 72))
+            docs.append(
+                (
+                    e,
+                    {
+                        "_id": object_id(5, i * len(self.exams) + e),
+                        "examId": exam["_id"],
+                        "studentId": object_id(4, i),
+                        "totalMarksObtained": obtained,
+                        "totalMaxMarks": exam["totalMarks"],
+                        "percentage": obtained * 100 / exam["totalMarks"],
+                        "feedback": rnd.choice(FEEDBACK),
+                        "evaluationDetails": questions,
+                        "createdAt": submitted,
+                        "updatedAt": submitted,
+                    },
+                )
+            )
+        return docs
+
+    def subject_of_exam(self, e):
+        return self.subjects[self._subject_of_exam[e]]
+
+    def insert_into(self, database, batch_size=10000):
+        """Drop and re-seed a real (or mongomock) database. Returns the examresults count."""
+        for name in (
+            main.EXAMRESULTS_COLLECTION,
+            main.EXAMS_COLLECTION,
+            main.SUBJECTS_COLLECTION,
+            main.USERS_COLLECTION,
+            "faculties",
+        ):
+            database[name].drop()
+        database["faculties"].insert_many(self.faculties)
+        database[main.SUBJECTS_COLLECTION].insert_many(self.subjects)
+        database[main.EXAMS_COLLECTION].insert_many(self.exams)
+
+        documents = 0
+        users, results = [], []
+        for i in range(self.n_students):
+            users.append(self.student(i))
+            results.extend(doc for _, doc in self.results(i))
+            if len(results) >= batch_size or i == self.n_students - 1:
+                database[main.USERS_COLLECTION].insert_many(users)
+                if results:
+                    database[main.EXAMRESULTS_COLLECTION].insert_many(results)
+                documents += len(results)
+                users, results = [], []
+        return documents
+
+
+class ReplayCollection:
+    """
+    examresults stand-in answering main.py's three pipelines (grouped,
+    per-result and per-student details) from rows precomputed as tuples.
+    The pipelines are only recognised, never executed: $match, $lookup and
+    $group cost nothing here. Documents are built as the cursor is consumed,
+    like BSON decoding.
+    """
+
+    GROUPED_FIELDS = (
+        "studentId",
+        "studentFirstName",
+        "studentLastName",
+        "Subject",
+        "Total_Score",
+        "MaxTotal",
+        "createdAt",
+    )
+    RAW_FIELDS = (
+        "raw_id",
+        "examId",
+        "examTitle",
+        "studentId",
+        "studentFirstName",
+        "studentLastName",
+        "Subject",
+        "Total_Score",
+        "MaxTotal",
+        "Percentage",
+        "createdAt",
+    )
+
+    def __init__(self, dataset):
+        self.dataset = dataset
+        self.grouped = []
+        self.raw = []
+        for i in range(dataset.n_students):
+            student = dataset.student(i)
+            sid = str(student["_id"])
+            first, last = student["firstName"], student["lastName"]
+            per_subject = {}
+            for e, doc in dataset.results(i):
+                exam = dataset.exams[e]
+                subject = dataset.subject_of_exam(e)["name"]
+                score, max_total, created = per_subject.get(
+                    subject, (0, 0, doc["createdAt"])
+                )
+                per_subject[subject] = (
+                    score + doc["totalMarksObtained"],
+                    max_total + doc["totalMaxMarks"],
+                    max(created, doc["createdAt"]),
+                )
+                self.raw.append(
+                    (
+                        str(doc["_id"]),
+                        str(exam["_id"]),
+                        exam["title"],
+                        sid,
+                        first,
+                        last,
+                        subject,
+                        doc["totalMarksObtained"],
+                        doc["totalMaxMarks"],
+                        doc["percentage"],
+                        doc["createdAt"],
+                    )
+                )
+            for subject, (score, max_total, created) in per_subject.items():
+                self.grouped.append(
+                    (sid, first, last, subject, score, max_total, created)
+                )
+        self.documents = len(self.raw)
+
+    def aggregate(self, pipeline, batchSize=None, **kwargs):
+        projected = pipeline[-1].get("$project", {})
+        if "evaluationDetails" in projected:
+            return self._details(pipeline[0]["$match"]["studentId"]["$in"])
+        if any("$group" in stage for stage in pipeline):
+            return (dict(zip(self.GROUPED_FIELDS, row)) for row in self.grouped)
+        return (dict(zip(self.RAW_FIELDS, row)) for row in self.raw)
+
+    def _details(self, student_ids):
+        for sid in sorted({str(sid) for sid in student_ids}):
+            kind, index = int(sid[:4], 16), int(sid[4:], 16)
+            if kind != 4 or index >= self.dataset.n_students:
+                continue
+            for e, doc in self.dataset.results(index):
+                yield {
+                    "_id": str(doc["_id"]),
+                    "studentId": sid,
+                    "examTitle": self.dataset.exams[e]["title"],
+                    "subjectName": self.dataset.subject_of_exam(e)["name"],
+                    "totalMarksObtained": doc["totalMarksObtained"],
+                    "totalMaxMarks": doc["totalMaxMarks"],
+                    "percentage": doc["percentage"],
+                    "feedback": doc["feedback"],
+                    "evaluationDetails": doc["evaluationDetails"],
+                    "createdAt": doc["createdAt"],
+                }
+
+
+def prepare_backend(dataset, args):
+    """Seed the chosen backend and point main.py at it. Returns the examresults count."""
+    if args.backend == "replay":
+        collection = ReplayCollection(dataset)
+        main.client = main.db = None
+        main.collection = collection
+        main.mongo_status = "connected"
+        return collection.documents
+
+    if args.backend == "mongodb":
+        from pymongo import MongoClient
+
+        database = MongoClient(args.mongo_uri)[args.db_name]
+    else:
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit("Install mongomock or pass --mongo-uri for a local MongoDB.")
+        database = mongomock.MongoClient()[args.db_name]
+    documents = dataset.insert_into(database)
+    main.client = database.client
+    main.db = database
+    main.collection = database[main.EXAMRESULTS_COLLECTION]
+    main.mongo_status = "connected"
+    return documents
+
+
+# --- Measurement ---
+def max_rss_bytes():
+    if resource is None:
+        return None
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def measure(fn, trace_memory):
+    """Run fn once; returns (result, seconds, traced peak bytes or None)."""
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        result = fn()
+    finally:
+        seconds = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        if trace_memory:
+            tracemalloc.stop()
+    return result, seconds, peak
+
+
+def repeated(fn, runs, trace_memory):
+    """Run fn `runs` times; returns (last result, seconds per run, max traced peak)."""
+    seconds, peaks, result = [], [], None
+    for _ in range(max(runs, 1)):
+        result, elapsed, peak = measure(fn, trace_memory)
+        seconds.append(elapsed)
+        peaks.append(peak or 0)
+    return result, seconds, (max(peaks) if trace_memory else None)
+
+
+def summarize(seconds, items=None, peak=None):
+    """Latency percentiles in ms, throughput per second and memory for one stage."""
+    ms = np.array(seconds) * 1000
+    stage = {
+        "runs": len(seconds),
+        "latency_ms": {
+            "mean": round(float(ms.mean()), 3),
+            "p50": round(float(np.percentile(ms, 50)), 3),
+            "p95": round(float(np.percentile(ms, 95)), 3),
+            "max": round(float(ms.max()), 3),
+        },
+        "max_rss_bytes": max_rss_bytes(),
+    }
+    total = sum(seconds)
+    if items is not None and total > 0:
+        stage["items"] = items
+        stage["items_per_second"] = round(items * len(seconds) / total, 1)
+    elif total > 0:
+        stage["requests_per_second"] = round(len(seconds) / total, 1)
+    if peak is not None:
+        stage["traced_peak_bytes"] = peak
+    return stage
+
+
+def random_filters(rnd, subjects):
+    filters = {
+        "performance": rnd.choice([None, *main.PERFORMANCE_LABELS]),
+        "risk": rnd.choice([None, *main.RISK_LABELS]),
+        "subject": rnd.choice([None, *subjects]),
+        "below": rnd.choice([None, 40, 60]),
+        "search": rnd.choice([None, None, "an", "Kh"]),
+    }
+    return {k: v for k, v in filters.items() if v is not None}
+
+
+def run_size(n_students, args):
+    from fastapi.testclient import TestClient
+
+    dataset = Dataset(
+        n_students,
+        args.subjects,
+        args.exams_per_subject,
+        args.attempt_rate,
+        args.seed,
+    )
+    documents, seed_seconds, _ = measure(
+        lambda: prepare_backend(dataset, args), trace_memory=False
+    )
+    main.student_details_cache.clear()
+    stages = {}
+
+    (df, subjects), seconds, peak = repeated(
+        main.load_data_from_mongo, args.ingest_repeat, args.trace_memory
+    )
+    # documents the pipeline returned, not the examresults it scanned
+    stages["load_data_from_mongo"] = summarize(
+        seconds, main.last_ingest_stats["documents"], peak
+    )
+    stages["load_data_from_mongo"]["ingest"] = dict(main.last_ingest_stats)
+    # replay hands back precomputed rows instead of running the pipelines
+    stages["load_data_from_mongo"]["pipeline"] = (
+        "client-side only" if args.backend == "replay" else "executed"
+    )
+
+    analyzer, seconds, peak = repeated(
+        lambda: main.PerformanceAnalyzer(df, subjects=subjects),
+        args.ingest_repeat,
+        args.trace_memory,
+    )
+    stages["preprocess"] = summarize(seconds, len(df), peak)
+    stages["preprocess"]["frame_bytes"] = analyzer.memory_report()["frame_bytes"]
+
+    # Serve the routes from this analyzer; no lifespan, no rebuilds during the run
+    main.snapshot_manager.stop()
+    main.snapshot_manager = main.SnapshotManager(
+        lambda: (analyzer, None), ttl=24 * 3600, poll_interval=0
+    )
+    # Publish (and warm) the snapshot before any route is timed
+    main.snapshot_manager.refresh()
+    rnd = random.Random(args.seed)
+    student_ids = analyzer.df["StudentID"].astype(str).tolist()
+    http = TestClient(main.app)
+
+    def get(url, **params):
+        response = http.get(url, params=params)
+        if response.status_code != 200:
+            raise RuntimeError(
+                f"{response.url} -> {response.status_code}: {response.text[:200]}"
+            )
+        return response
+
+    def uncached(url):
+        # Drop rendered bodies so the request renders instead of replaying a cache hit
+        main.response_cache.clear()
+        return get(url)
+
+    def cold_report():
+        # Drop cached details so every request pays for its details lookup
+        main.student_details_cache.clear()
+        return uncached(f"/report/{rnd.choice(student_ids)}")
+
+    routes = {
+        "home": lambda: uncached("/"),
+        "home_cached": lambda: get("/"),
+        "filter": lambda: get("/filter", **random_filters(rnd, subjects)),
+        "report": cold_report,
+        # details cached, page rendered on every request
+        "report_details_cached": lambda: uncached(f"/report/{student_ids[0]}"),
+        "report_cached": lambda: get(f"/report/{student_ids[0]}"),
+    }
+    for name, request in routes.items():
+        _, seconds, peak = repeated(request, args.repeat, args.trace_memory)
+        stages[name] = summarize(seconds, peak=peak)
+
+    main.snapshot_manager.stop()
+    return {
+        "students": n_students,
+        "subjects": len(subjects),
+        "examresults": documents,
+        "seed_seconds": round(seed_seconds, 3),
+        "stages": stages,
+    }
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", help="class sizes (default: per backend)"
+    )
+    parser.add_argument("--subjects", type=int, default=6)
+    parser.add_argument("--exams-per-subject", type=int, default=2)
+    parser.add_argument(
+        "--attempt-rate",
+        type=float,
+        default=0.85,
+        help="chance a student has a result for a given exam",
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=10, help="requests per route")
+    parser.add_argument(
+        "--ingest-repeat", type=int, default=3, help="runs of ingest/preprocess"
+    )
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="record tracemalloc peaks per stage (slower)",
+    )
+    parser.add_argument("--backend", choices=["replay", "mongomock", "mongodb"])
+    parser.add_argument("--mongo-uri", help="local MongoDB (implies --backend mongodb)")
+    parser.add_argument("--db-name", default="exam_benchmark")
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    args = parser.parse_args(argv)
+    args.backend = args.backend or ("mongodb" if args.mongo_uri else "mongomock")
+    args.sizes = args.sizes or DEFAULT_SIZES[args.backend]
+    if args.backend == "mongodb" and not args.mongo_uri:
+        parser.error("--backend mongodb needs --mongo-uri")
+
+    report = {
+        "meta": {
+            "backend": args.backend,
+            "aggregation_mode": main.AGGREGATION_MODE,
+            "compact_frame": main.COMPACT_FRAME,
+            "seed": args.seed,
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "started_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        },
+        "runs": [],
+    }
+    for n_students in args.sizes:
+        print(f"Benchmarking {n_students} students...", file=sys.stderr)
+        report["runs"].append(run_size(n_students, args))
+
+    output = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main_cli()
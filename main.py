@@ -2,20 +2,78 @@
 import os
 import binascii
 import secrets
+import contextvars
+import hashlib
+import shutil
+import asyncio
+import functools
+import itertools
+import json
+import multiprocessing
+import threading
+import time
+import tracemalloc
+import zipfile
+import zlib
+from collections import OrderedDict, defaultdict
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 import pandas as pd
 import numpy as np
-from fastapi import FastAPI, Request, Query, HTTPException
-from fastapi.responses import HTMLResponse, JSONResponse
-from jinja2 import Template
+from fastapi import FastAPI, Request, Query, HTTPException, Depends
+from fastapi.responses import (
+    HTMLResponse,
+    JSONResponse,
+    Response,
+    StreamingResponse,
+)
+from jinja2 import Environment
+import plotly
 import plotly.express as px
 import plotly.graph_objects as go
+from plotly.offline import get_plotlyjs
+from bson import ObjectId, json_util
+from bson.errors import InvalidId
 from pymongo import MongoClient
 from pymongo.errors import ConnectionFailure
 from dotenv import load_dotenv
+from html import escape
+from urllib.parse import urlencode
+
+try:  # optional: only needed for Parquet exports
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+try:  # optional: br responses when installed, gzip otherwise
+    import brotli
+except ImportError:
+    brotli = None
+
+try:  # Unix only: peak RSS in the ingest stats
+    import resource
+except ImportError:
+    resource = None
+
+try:  # Unix only: flock elects the builder for SNAPSHOT_SHARED_DIR
+    import fcntl
+except ImportError:
+    fcntl = None
 
 load_dotenv()
 
+# Analyzer frames share column data instead of deep-copying it (default in pandas >= 3)
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
 # --- MongoDB Setup ---
 MONGO_URI = os.getenv("MONGO_URI")
 DB_NAME = os.getenv("DB_NAME", "test")  # your DB shown in screenshots is 'test'
@@ -23,35 +81,358 @@ EXAMRESULTS_COLLECTION = os.getenv("EXAMRESULTS_COLLECTION", "examresults")
 EXAMS_COLLECTION = os.getenv("EXAMS_COLLECTION", "exams")
 SUBJECTS_COLLECTION = os.getenv("SUBJECTS_COLLECTION", "subjects")
 USERS_COLLECTION = os.getenv("USERS_COLLECTION", "users")
+FACULTIES_COLLECTION = os.getenv("FACULTIES_COLLECTION", "faculties")
+# Seconds before retrying a failed connection, doubling up to the max; 0 disables
+MONGO_RETRY_SECONDS = float(os.getenv("MONGO_RETRY_SECONDS", "5"))
+MONGO_RETRY_MAX_SECONDS = float(os.getenv("MONGO_RETRY_MAX_SECONDS", "60"))
+# "server": $group per student+subject inside MongoDB; "client": ship every result and group in pandas
+AGGREGATION_MODE = os.getenv("AGGREGATION_MODE", "server")
+# Documents fetched per cursor round-trip while streaming the aggregation
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "5000"))
+# Trace Python allocations during ingestion to report an exact peak (slower)
+INGEST_TRACE_MEMORY = os.getenv("INGEST_TRACE_MEMORY", "0") == "1"
+
+# --- Blocking work (pymongo, pandas, plotly) runs in this many threads off the event loop ---
+BLOCKING_POOL_SIZE = int(os.getenv("BLOCKING_POOL_SIZE", "8"))
+
+# --- Analyzer frame layout ---
+# Categorical text columns and float32/int32 marks and ranks in the hot frame
+COMPACT_FRAME = os.getenv("COMPACT_FRAME", "1") == "1"
+
+# --- Per-student report details (feedback, evaluationDetails) ---
+STUDENT_DETAILS_CACHE_SIZE = int(os.getenv("STUDENT_DETAILS_CACHE_SIZE", "256"))
+
+# --- Bulk class reports ---
+# Processes rendering reports in parallel (default: one per CPU); 0 renders in the calling thread
+BULK_REPORT_WORKERS = int(os.getenv("BULK_REPORT_WORKERS", str(os.cpu_count() or 1)))
+# Students handed to a worker process per task
+BULK_REPORT_CHUNK_SIZE = int(os.getenv("BULK_REPORT_CHUNK_SIZE", "25"))
+# Bulk runs rendering in worker processes at once; later runs wait for a slot
+BULK_REPORT_CONCURRENCY = int(os.getenv("BULK_REPORT_CONCURRENCY", "1"))
+
+# --- Table exports ---
+# Rows serialized per chunk while streaming /export
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "5000"))
+
+# --- Conditional GET and compressed responses ---
+# Bytes of encoded / , /filter and /report bodies kept for the current snapshot
+RESPONSE_CACHE_BYTES = int(os.getenv("RESPONSE_CACHE_BYTES", str(64 * 1024 * 1024)))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
+# --- Student table paging ---
+TABLE_PAGE_SIZE = int(os.getenv("TABLE_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "500"))
+
+# --- Snapshot cache settings ---
+# How long (seconds) a built analyzer is served before a background rebuild
+SNAPSHOT_TTL_SECONDS = float(os.getenv("SNAPSHOT_TTL_SECONDS", "60"))
+# How often (seconds) to look for new/updated examresults and patch the snapshot; 0 disables
+SNAPSHOT_POLL_SECONDS = float(os.getenv("SNAPSHOT_POLL_SECONDS", "5"))
+# Timestamp field used as the polling high-water mark (mongoose `timestamps: true`)
+EXAMRESULTS_CHANGE_FIELD = os.getenv("EXAMRESULTS_CHANGE_FIELD", "updatedAt")
+# Prefer a change stream (replica sets / Atlas); falls back to polling when unsupported
+SNAPSHOT_CHANGE_STREAM = os.getenv("SNAPSHOT_CHANGE_STREAM", "1") == "1"
+# Create the examresults indexes the analytics queries rely on (idempotent)
+ENSURE_INDEXES = os.getenv("ENSURE_INDEXES", "1") == "1"
+
+# --- Scoped dashboards (one exam, subject, department or date range) ---
+# Per-scope snapshots kept in memory, least recently used evicted first
+SCOPE_CACHE_SIZE = int(os.getenv("SCOPE_CACHE_SIZE", "16"))
+# A scoped snapshot is rebuilt on the next request once it is this old
+SCOPE_TTL_SECONDS = float(os.getenv("SCOPE_TTL_SECONDS", str(SNAPSHOT_TTL_SECONDS)))
+
+# --- Trend rollups (weekly/monthly/per-term totals materialized with $merge) ---
+TREND_ROLLUPS = os.getenv("TREND_ROLLUPS", "1") == "1"
+ROLLUP_COLLECTION = os.getenv("ROLLUP_COLLECTION", "examresult_rollups")
+# Full re-materialization interval; between runs only changed students are re-rolled
+ROLLUP_REBUILD_SECONDS = float(os.getenv("ROLLUP_REBUILD_SECONDS", "3600"))
+# Months in which a term starts, e.g. "1,7" for January and July semesters
+TERM_START_MONTHS = sorted(
+    int(m) for m in os.getenv("TERM_START_MONTHS", "1,7").split(",") if m.strip()
+)
+
+# --- Shared snapshot across uvicorn workers ---
+# Directory where one elected worker publishes memory-mapped snapshot columns; empty disables
+SNAPSHOT_SHARED_DIR = os.getenv("SNAPSHOT_SHARED_DIR", "")
+# How often (seconds) the other workers look for a newer published version
+SNAPSHOT_SHARED_POLL_SECONDS = float(os.getenv("SNAPSHOT_SHARED_POLL_SECONDS", "1"))
+# Directory where a single worker keeps its last snapshot for warm restarts; empty disables.
+# The shared directory above is persisted the same way and takes precedence.
+SNAPSHOT_PERSIST_DIR = os.getenv("SNAPSHOT_PERSIST_DIR", "")
 
 client = None
 db = None
 collection = None
+# "pending" until the app's lifespan warm-up calls connect_mongo()
+mongo_status = "pending"
+
+
+def connect_mongo():
+    """Connect to MongoDB and set the module-level client/db/collection."""
+    global client, db, collection, mongo_status
+    mongo_status = "connecting"
+    try:
+        client = MongoClient(MONGO_URI)
+        # Basic connection test
+        client.admin.command("ismaster")
+        db = client[DB_NAME]
+        collection = db[EXAMRESULTS_COLLECTION]
+        mongo_status = "connected"
+        print("Successfully connected to MongoDB Atlas.")
+        if ENSURE_INDEXES:
+            try:
+                # per-student report lookups and the change polling high-water mark
+                collection.create_index([("studentId", 1)])
+                collection.create_index([(EXAMRESULTS_CHANGE_FIELD, 1)])
+                # scoped dashboards: $match on examId and/or a createdAt range
+                collection.create_index([("examId", 1), ("createdAt", 1)])
+                collection.create_index([("createdAt", 1)])
+                if TREND_ROLLUPS:
+                    trend_rollups.ensure_indexes()
+            except Exception as e:
+                print(f"Could not ensure examresults indexes: {e}")
+    except ConnectionFailure as e:
+        mongo_status = "failed"
+        print(
+            f"MongoDB Connection FAILED. Check MONGO_URI and network access. Error: {e}"
+        )
+    except Exception as e:
+        mongo_status = "failed"
+        print(f"An unexpected error occurred during MongoDB initialization: {e}")
+
+
+# --- Instrumentation: Prometheus-format /metrics and Server-Timing headers ---
+# Upper bounds (seconds) of the duration histogram buckets
+METRIC_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+)
+METRIC_HELP = {
+    "dashboard_stage_seconds": (
+        "histogram",
+        "Time spent per pipeline stage (mongo_aggregate, pivot, preprocess, plotly, template, mongo_details).",
+    ),
+    "dashboard_request_seconds": ("histogram", "HTTP request latency by route."),
+    "dashboard_requests_total": ("counter", "HTTP requests by route and status."),
+    "dashboard_snapshot_builds_total": (
+        "counter",
+        "Snapshots published by kind (full, incremental, published, restored, scoped).",
+    ),
+    "dashboard_snapshot_build_seconds": ("histogram", "Snapshot build time by kind."),
+    "dashboard_snapshot_build_failures_total": (
+        "counter",
+        "Failed snapshot builds by kind; the previous snapshot stays in service.",
+    ),
+    "dashboard_cache_requests_total": ("counter", "Cache lookups by cache and result."),
+    "dashboard_ingest_documents_total": (
+        "counter",
+        "Documents read from the examresults aggregation.",
+    ),
+    "dashboard_snapshot_version": ("gauge", "Version of the snapshot being served."),
+    "dashboard_snapshot_age_seconds": ("gauge", "Age of the snapshot being served."),
+    "dashboard_snapshot_rows": ("gauge", "Students in the snapshot being served."),
+    "dashboard_snapshot_subjects": ("gauge", "Subjects in the snapshot being served."),
+    "dashboard_snapshot_frame_bytes": ("gauge", "Memory used by the analyzer frame."),
+    "dashboard_mongo_connected": ("gauge", "1 when MongoDB is connected."),
+}
+
+
+class Metrics:
+    """Thread-safe counters, gauges and histograms rendered in Prometheus text format."""
+
+    def __init__(self, buckets=METRIC_BUCKETS):
+        self.buckets = buckets
+        self._values = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._values[self._key(name, labels)] = value
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                # per-bucket counts, then sum and count
+                histogram = self._histograms[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[i] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    @staticmethod
+    def _labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ""
+        escaped = []
+        for k, v in pairs:
+            v = str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            escaped.append(f'{k}="{v}"')
+        return "{" + ",".join(escaped) + "}"
 
-try:
-    client = MongoClient(MONGO_URI)
-    # Basic connection test
-    client.admin.command("ismaster")
-    db = client[DB_NAME]
-    collection = db[EXAMRESULTS_COLLECTION]
-    print("Successfully connected to MongoDB Atlas.")
-except ConnectionFailure as e:
-    print(f"MongoDB Connection FAILED. Check MONGO_URI and network access. Error: {e}")
-except Exception as e:
-    print(f"An unexpected error occurred during MongoDB initialization: {e}")
+    def render(self):
+        with self._lock:
+            values = dict(self._values)
+            histograms = {k: list(v) for k, v in self._histograms.items()}
+        by_name = defaultdict(list)
+        for (name, labels), value in sorted(values.items()):
+            by_name[name].append(f"{name}{self._labels(labels)} {value}")
+        for (name, labels), histogram in sorted(histograms.items()):
+            lines = by_name[name]
+            for bound, count in zip(self.buckets, histogram):
+                le = (("le", bound),)
+                lines.append(f"{name}_bucket{self._labels(labels, le)} {count}")
+            inf = (("le", "+Inf"),)
+            lines.append(f"{name}_bucket{self._labels(labels, inf)} {histogram[-1]}")
+            lines.append(f"{name}_sum{self._labels(labels)} {histogram[-2]}")
+            lines.append(f"{name}_count{self._labels(labels)} {histogram[-1]}")
+        out = []
+        for name in sorted(by_name):
+            kind, help_text = METRIC_HELP.get(name, ("untyped", name))
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+            out.extend(by_name[name])
+        return "\n".join(out) + "\n"
+
+
+metrics = Metrics()
+
+# Stage timings of the current request, reported back as a Server-Timing header
+request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+def record_stage(stage, seconds):
+    metrics.observe("dashboard_stage_seconds", seconds, stage=stage)
+    timings = request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+@contextmanager
+def stage_timer(stage):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
 
 
 # --- Helper to aggregate and load real data from examresults ---
-def load_data_from_mongo():
+def student_id_values(student_ids):
     """
-    Aggregate examresults -> join exams -> join subjects -> join users
-    Build a normalized DataFrame and pivot by subject to one row per student.
+    Values to use in a `studentId` $match: the ObjectId form of each id (how
+    mongoose stores refs) plus the raw value, so string ids still match.
     """
-    if collection is None:
-        raise Exception("MongoDB collection is not initialized. Cannot load data.")
+    values = []
+    for sid in student_ids:
+        values.append(sid)
+        if isinstance(sid, str):
+            try:
+                values.append(ObjectId(sid))
+            except (InvalidId, TypeError):
+                pass
+    return values
+
+
+class ColumnBuffer:
+    """Growable typed NumPy column; capacity doubles as batches are appended."""
+
+    def __init__(self, dtype, capacity=1024):
+        self._data = np.empty(capacity, dtype=dtype)
+        self._size = 0
+
+    def extend(self, values):
+        needed = self._size + len(values)
+        if needed > len(self._data):
+            grown = np.empty(max(needed, 2 * len(self._data)), dtype=self._data.dtype)
+            grown[: self._size] = self._data[: self._size]
+            self._data = grown
+        self._data[self._size : needed] = values
+        self._size = needed
 
-    # Aggregation pipeline to fetch joined records
-    pipeline = [
+    def to_array(self):
+        return self._data[: self._size]
+
+    @property
+    def nbytes(self):
+        return self._data.nbytes
+
+
+class StringColumn:
+    """
+    Dictionary-encoded string column: each distinct value is stored once and
+    rows hold int32 codes into it.
+    """
+
+    def __init__(self):
+        self._codes = ColumnBuffer(np.int32)
+        self._pending = []
+        self._lookup = {}
+        self.categories = []
+
+    def append(self, value):
+        code = self._lookup.get(value)
+        if code is None:
+            code = self._lookup[value] = len(self.categories)
+            self.categories.append(value)
+        self._pending.append(code)
+        if len(self._pending) >= 1024:
+            self._flush()
+
+    def _flush(self):
+        if self._pending:
+            self._codes.extend(self._pending)
+            self._pending = []
+
+    @property
+    def codes(self):
+        self._flush()
+        return self._codes.to_array()
+
+    def to_array(self):
+        # object array of references to the shared category strings
+        return np.array(self.categories, dtype=object)[self.codes]
+
+    @property
+    def nbytes(self):
+        self._flush()
+        return self._codes.nbytes + sum(len(c) for c in self.categories)
+
+
+# Figures for the most recent load_data_from_mongo() call (memory sizing)
+last_ingest_stats = {}
+
+
+def results_pipeline(match=None):
+    """One joined document per exam result (AGGREGATION_MODE=client)."""
+    pipeline = [{"$match": match}] if match else []
+    pipeline += [
         # bring in exam doc
         {
             "$lookup": {
@@ -96,183 +477,564 @@ def load_data_from_mongo():
                 "Total_Score": {"$ifNull": ["$totalMarksObtained", 0]},
                 "MaxTotal": {"$ifNull": ["$totalMaxMarks", 0]},
                 "Percentage": {"$ifNull": ["$percentage", None]},
-                "Feedback": {"$ifNull": ["$feedback", ""]},
-                "evaluationDetails": {"$ifNull": ["$evaluationDetails", []]},
                 "createdAt": 1,
             }
         },
     ]
+    return pipeline
+
+
+def grouped_results_pipeline(match=None):
+    """
+    One document per student+subject (AGGREGATION_MODE=server): marks are summed
+    by MongoDB right after the exam join, so subjects and users are looked up on
+    the grouped rows.
+    """
+    pipeline = [{"$match": match}] if match else []
+    pipeline += [
+        # exam doc only for its subject id
+        {
+            "$lookup": {
+                "from": EXAMS_COLLECTION,
+                "localField": "examId",
+                "foreignField": "_id",
+                "as": "exam",
+            }
+        },
+        {"$unwind": {"path": "$exam", "preserveNullAndEmptyArrays": True}},
+        {
+            "$group": {
+                "_id": {"studentId": "$studentId", "subjectId": "$exam.subject"},
+                "Total_Score": {"$sum": {"$ifNull": ["$totalMarksObtained", 0]}},
+                "MaxTotal": {"$sum": {"$ifNull": ["$totalMaxMarks", 0]}},
+                "createdAt": {"$max": "$createdAt"},
+            }
+        },
+        {
+            "$lookup": {
+                "from": SUBJECTS_COLLECTION,
+                "localField": "_id.subjectId",
+                "foreignField": "_id",
+                "as": "subject",
+            }
+        },
+        {"$unwind": {"path": "$subject", "preserveNullAndEmptyArrays": True}},
+        {
+            "$lookup": {
+                "from": USERS_COLLECTION,
+                "localField": "_id.studentId",
+                "foreignField": "_id",
+                "as": "student",
+            }
+        },
+        {"$unwind": {"path": "$student", "preserveNullAndEmptyArrays": True}},
+        {
+            "$project": {
+                "_id": 0,
+                "studentId": {"$toString": "$student._id"},
+                "studentFirstName": "$student.firstName",
+                "studentLastName": "$student.lastName",
+                "Subject": "$subject.name",
+                "Total_Score": 1,
+                "MaxTotal": 1,
+                "createdAt": 1,
+            }
+        },
+    ]
+    return pipeline
+
+
+def load_data_from_mongo(match=None, mode=None):
+    """
+    Aggregate examresults -> join exams -> join subjects -> join users
+    Build a normalized DataFrame and pivot by subject to one row per student.
+    `match` optionally restricts the examresults scanned (e.g. to a set of students).
+    `mode` overrides AGGREGATION_MODE ("server" or "client").
+    """
+    if collection is None:
+        raise Exception("MongoDB collection is not initialized. Cannot load data.")
+
+    mode = mode or AGGREGATION_MODE
+    if mode == "server":
+        pipeline = grouped_results_pipeline(match)
+    else:
+        pipeline = results_pipeline(match)
+
+    started = time.perf_counter()
+    if INGEST_TRACE_MEMORY:
+        tracemalloc.start()
+
+    student_ids = StringColumn()
+    names = StringColumn()
+    subject_names = StringColumn()
+    total_scores = ColumnBuffer(np.float64)
+    max_totals = ColumnBuffer(np.float64)
+    batches = 0
 
     try:
-        docs = list(collection.aggregate(pipeline))
+        cursor = collection.aggregate(pipeline, batchSize=INGEST_BATCH_SIZE)
+        while True:
+            batch = list(itertools.islice(cursor, INGEST_BATCH_SIZE))
+            if not batch:
+                break
+            batches += 1
+            # combine student name, subject, scores straight into the column buffers
+            for d in batch:
+                full_name = (
+                    (d.get("studentFirstName") or "")
+                    + " "
+                    + (d.get("studentLastName") or "")
+                ).strip()
+                student_ids.append(d.get("studentId") or "")
+                names.append(full_name or "Unknown Student")
+                subject_names.append(d.get("Subject") or "Unknown")
+            total_scores.extend([d.get("Total_Score") or 0 for d in batch])
+            max_totals.extend([d.get("MaxTotal") or 0 for d in batch])
     except Exception as e:
+        if INGEST_TRACE_MEMORY:
+            tracemalloc.stop()
         raise Exception(f"MongoDB aggregation error: {e}")
+    # Cursor time includes the server-side pipeline; buffering is interleaved with it
+    record_stage("mongo_aggregate", time.perf_counter() - started)
 
-    if not docs:
+    # Build the frame once from the typed columns
+    df_raw = pd.DataFrame(
+        {
+            "StudentID": student_ids.to_array(),
+            "Name": names.to_array(),
+            "Subject": subject_names.to_array(),
+            "Total_Score": total_scores.to_array(),
+            "MaxTotal": max_totals.to_array(),
+        }
+    )
+
+    metrics.inc("dashboard_ingest_documents_total", len(df_raw), mode=mode)
+    last_ingest_stats.clear()
+    last_ingest_stats.update(
+        {
+            "mode": mode,
+            "documents": len(df_raw),
+            "batches": batches,
+            "batch_size": INGEST_BATCH_SIZE,
+            "buffer_bytes": sum(
+                c.nbytes
+                for c in (student_ids, names, subject_names, total_scores, max_totals)
+            ),
+            "frame_bytes": int(df_raw.memory_usage(deep=True).sum()),
+            "process_peak_rss_bytes": (
+                resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+                if resource is not None
+                else None
+            ),
+            "seconds": round(time.perf_counter() - started, 4),
+        }
+    )
+    if INGEST_TRACE_MEMORY:
+        last_ingest_stats["traced_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    if df_raw.empty:
         # no data found — return empty DataFrame
         return pd.DataFrame(), []
 
-    # Build processed rows: combine student name, subject, scores
-    rows = []
-    for d in docs:
-        full_name = (
-            (d.get("studentFirstName") or "") + " " + (d.get("studentLastName") or "")
-        ).strip()
-        rows.append(
-            {
-                "StudentID": d.get("studentId") or "",
-                "Name": full_name or "Unknown Student",
-                "Subject": d.get("Subject") or "Unknown",
-                "Total_Score": d.get("Total_Score") or 0,
-                "MaxTotal": d.get("MaxTotal") or 0,
-                "Percentage": d.get(
-                    "Percentage"
-                ),  # may be None; we'll compute after grouping
-                "Feedback": d.get("Feedback") or "",
-                "evaluationDetails": d.get("evaluationDetails") or [],
-                "examTitle": d.get("examTitle") or "",
-                "createdAt": d.get("createdAt", None),
-            }
-        )
+    with stage_timer("pivot"):
+        return build_student_pivot(df_raw)
 
-    df_raw = pd.DataFrame(rows)
 
-    if df_raw.empty:
-        return pd.DataFrame(), []
+def build_student_pivot(df_raw):
+    """
+    Turn per-result (or per student+subject) records with StudentID, Name,
+    Subject, Total_Score and MaxTotal into one row per student with a column
+    per subject plus Total, MaxTotal, Percentage and Status.
+    Every step is a grouped/vectorized operation, so cost is linear in the rows.
+    """
+    keys = ["StudentID", "Name"]
 
     # Aggregate per student+subject (sum scores/max) in case of multiple exam entries
-    grouped = df_raw.groupby(["StudentID", "Name", "Subject"], as_index=False).agg(
+    grouped = df_raw.groupby(keys + ["Subject"], as_index=False).agg(
         {
             "Total_Score": "sum",
             "MaxTotal": "sum",
-            # pick the latest feedback/examTitle/createdAt for display (if multiple)
-            "Feedback": lambda x: " ||| ".join([s for s in x if s]),
-            "evaluationDetails": lambda x: [
-                item for sub in x for item in (sub if isinstance(sub, list) else [])
-            ],
-            "examTitle": lambda x: " | ".join([s for s in x if s]),
-            "createdAt": "max",
         }
     )
 
-    # Compute percentage for aggregated rows
-    def compute_pct(row):
-        try:
-            if row["MaxTotal"] and row["MaxTotal"] > 0:
-                return (row["Total_Score"] / row["MaxTotal"]) * 100
-        except Exception:
-            pass
-        return 0.0
-
-    grouped["Percentage"] = grouped.apply(compute_pct, axis=1)
+    # Percentage for aggregated rows (0 where MaxTotal is missing)
+    grouped["Percentage"] = (
+        (grouped["Total_Score"] / grouped["MaxTotal"].where(grouped["MaxTotal"] > 0))
+        .mul(100)
+        .fillna(0.0)
+    )
 
     # Pivot to prepare one-row-per-student with subject columns containing Total_Score
     subjects = sorted(grouped["Subject"].dropna().unique().tolist())
     df_pivot = grouped.pivot_table(
-        index=["StudentID", "Name"],
+        index=keys,
         columns="Subject",
         values="Total_Score",
         fill_value=0,
-    ).reset_index()
+    )
+    df_pivot.columns.name = None
 
     # Ensure all subject columns exist
     for s in subjects:
         if s not in df_pivot.columns:
             df_pivot[s] = 0
 
-    # Also compute aggregated totals per student across subjects (Total and MaxTotal)
-    # To compute MaxTotal per subject we need subject-wise max totals; we'll compute per student from grouped.
-    # Summation of grouped MaxTotal per student:
-    max_by_student = grouped.groupby(["StudentID", "Name"], as_index=False)[
-        "MaxTotal"
-    ].sum()
-    total_by_student = grouped.groupby(["StudentID", "Name"], as_index=False)[
-        "Total_Score"
-    ].sum()
-
-    df_pivot = df_pivot.merge(total_by_student, on=["StudentID", "Name"], how="left")
-    df_pivot = df_pivot.merge(
-        max_by_student, on=["StudentID", "Name"], how="left", suffixes=("", "_Max")
-    )
-
-    # Normalize column names and ensure they are numeric
-    df_pivot.rename(columns={"Total_Score": "Total"}, inplace=True)
-    df_pivot["MaxTotal"] = pd.to_numeric(df_pivot["MaxTotal"], errors="coerce").fillna(
-        0
+    # Per-student totals in one grouped pass
+    per_student = grouped.groupby(keys).agg(
+        Total=("Total_Score", "sum"),
+        MaxTotal=("MaxTotal", "sum"),
     )
+    df_pivot = df_pivot.join(per_student).reset_index()
 
-    # If columns inserted above have unexpected names, ensure 'Total' exists:
-    if "Total" not in df_pivot.columns:
-        # ensure subject columns are numeric before summing
-        for s in subjects:
-            df_pivot[s] = pd.to_numeric(df_pivot[s], errors="coerce").fillna(0)
-        df_pivot["Total"] = df_pivot[subjects].sum(axis=1)
-
-    # Ensure MaxTotal column exists and is numeric (from merge)
-    if "MaxTotal" not in df_pivot.columns:
-        df_pivot["MaxTotal"] = (
-            grouped.groupby(["StudentID", "Name"])["MaxTotal"]
-            .sum()
-            .reindex(df_pivot.set_index(["StudentID", "Name"]).index)
-            .fillna(0)
-            .values
-        )
-    # Re-ensure MaxTotal is numeric after all joins/calculations
+    # Ensure totals are numeric
+    df_pivot["Total"] = pd.to_numeric(df_pivot["Total"], errors="coerce").fillna(0)
     df_pivot["MaxTotal"] = pd.to_numeric(df_pivot["MaxTotal"], errors="coerce").fillna(
         0
     )
 
-    # Add Status and Feedback placeholder (we'll create aggregated feedback)
-    df_pivot["Feedback"] = df_pivot.apply(
-        lambda row: " ; ".join(
-            grouped[
-                (grouped["StudentID"] == row["StudentID"])
-                & (grouped["Name"] == row["Name"])
-            ]["Feedback"]
-            .astype(str)
-            .tolist()
-        ),
-        axis=1,
-    )
-
-    # Calculate Percentage
     # Calculate Percentage (using numpy.where for vectorized safety)
-    # Ensure Total is numeric first
-    df_pivot["Total"] = pd.to_numeric(df_pivot["Total"], errors="coerce").fillna(0)
-
     df_pivot["Percentage"] = np.where(
         df_pivot["MaxTotal"] > 0, (df_pivot["Total"] / df_pivot["MaxTotal"]) * 100, 0.0
     )
 
-    # Calculate Status (pass if all subject percentages >= 40 else Fail) - using subject raw scores
-    def status_for_row(r):
-        # if any subject score < 40 (out of subject-level max unknown), we use percentage here: treat threshold per-subject as 40
-        # simpler approach: fail if overall Percentage < 40
-        return "Fail" if r.get("Percentage", 0) < 40 else "Pass"
-
-    df_pivot["Status"] = df_pivot.apply(status_for_row, axis=1)
+    # Status: fail if overall Percentage < 40
+    df_pivot["Status"] = np.where(df_pivot["Percentage"] < 40, "Fail", "Pass")
 
     # Return pivoted df and subjects list for dropdown
     return df_pivot, subjects
 
 
+# --- Per-snapshot filter indexes ---
+def intersect_positions(candidates, n_rows):
+    """Intersect sorted position arrays, smallest first; no candidates means all rows."""
+    if not candidates:
+        return np.arange(n_rows)
+    candidates = sorted(candidates, key=len)
+    positions = candidates[0]
+    for other in candidates[1:]:
+        if len(positions) == 0:
+            break
+        positions = np.intersect1d(positions, other, assume_unique=True)
+    return positions
+
+
+class StudentFilterIndex:
+    """
+    Lookup structures for the /filter criteria, built once per snapshot:
+    position arrays per Performance/Risk Level, per-subject participation and
+    score-sorted arrays (for `below` via binary search), and a lowercase
+    trigram index over names. All position arrays are sorted. Given the index
+    of the previous snapshot, trigram postings are carried forward when the
+    existing rows kept their names, and only appended rows are indexed.
+    """
+
+    def __init__(self, df, subjects, previous=None):
+        self.n_rows = len(df)
+        self.level_positions = self._positions_by_value(df["Performance Level"])
+        self.risk_positions = self._positions_by_value(df["Risk Level"])
+
+        self._participants = {}
+        self._by_score = {}
+        for subject in subjects:
+            scores = df[subject].to_numpy(dtype=float)
+            order = np.argsort(scores, kind="stable")
+            self._participants[subject] = np.flatnonzero(scores > 0)
+            self._by_score[subject] = (scores[order], order)
+
+        self._names = [str(n).lower() for n in df["Name"].tolist()]
+        start = 0
+        self._trigram_positions = {}
+        if previous is not None:
+            start = len(previous._names)
+            if self._names[:start] == previous._names:
+                self._trigram_positions = dict(previous._trigram_positions)
+            else:
+                start = 0
+        postings = {}
+        for pos in range(start, len(self._names)):
+            for gram in self._trigrams(self._names[pos]):
+                postings.setdefault(gram, []).append(pos)
+        for gram, p in postings.items():
+            added = np.array(p, dtype=np.int64)
+            carried = self._trigram_positions.get(gram)
+            self._trigram_positions[gram] = (
+                added if carried is None else np.concatenate([carried, added])
+            )
+
+    @staticmethod
+    def _positions_by_value(series):
+        values = series.astype(object).to_numpy()
+        result = {}
+        for value in pd.unique(values):
+            if value is None or (isinstance(value, float) and np.isnan(value)):
+                continue
+            result[str(value)] = np.flatnonzero(values == value)
+        return result
+
+    @staticmethod
+    def _trigrams(text):
+        return {text[i : i + 3] for i in range(len(text) - 2)}
+
+    def subject_positions(self, subject, below=None):
+        """Students who took `subject` (score > 0), optionally scoring below `below`."""
+        positions = self._participants[subject]
+        if below is None:
+            return positions
+        sorted_scores, order = self._by_score[subject]
+        under = np.sort(order[: np.searchsorted(sorted_scores, below, side="left")])
+        return np.intersect1d(positions, under, assume_unique=True)
+
+    def name_positions(self, query, within):
+        """Positions in `within` whose lowercase name contains `query`."""
+        query = query.lower()
+        grams = self._trigrams(query)
+        if grams:
+            postings = [
+                self._trigram_positions.get(gram, np.arange(0)) for gram in grams
+            ]
+            within = intersect_positions(postings + [within], self.n_rows)
+        # trigram hits are candidates only; confirm the full substring
+        names = self._names
+        return np.array(
+            [pos for pos in within.tolist() if query in names[pos]], dtype=np.int64
+        )
+
+
+def patch_column(column, positions, values, length):
+    """
+    Copy of `column` extended to `length` rows, with `values` written at
+    `positions`. Categoricals are patched through their codes.
+    """
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        values = pd.Series(values).astype(object)
+        categories = column.cat.categories
+        found = categories.get_indexer(values.to_numpy())
+        missing = (found < 0) & values.notna().to_numpy()
+        if missing.any():
+            new = pd.Index(pd.unique(values[missing]))
+            found[missing] = len(categories) + new.get_indexer(values[missing])
+            categories = categories.append(new)
+        codes = np.full(length, -1, dtype=np.int64)
+        codes[: len(column)] = column.cat.codes.to_numpy()
+        codes[positions] = found
+        return pd.Series(
+            pd.Categorical.from_codes(
+                codes, categories=categories, ordered=column.cat.ordered
+            ),
+            name=column.name,
+        )
+    current = column.to_numpy()
+    patched = np.empty(length, dtype=current.dtype)
+    patched[: len(current)] = current
+    patched[positions] = np.asarray(values)
+    return pd.Series(patched, name=column.name, dtype=column.dtype)
+
+
+def descending_max_rank(scores, sorted_scores=None):
+    """Rank with method="max", descending: the number of scores >= each score."""
+    if sorted_scores is None:
+        sorted_scores = np.sort(scores)
+    return len(sorted_scores) - np.searchsorted(sorted_scores, scores, side="left")
+
+
+class StudentLeaderboard:
+    """
+    Best-first orderings of the snapshot, overall (by Percentage) and per
+    subject (by score, participants only), each built on first use. Top and
+    bottom K and neighbours are slices; rank and percentile are binary
+    searches on the sorted scores, so no request re-sorts the frame.
+    """
+
+    def __init__(self, df, subjects):
+        self.n_rows = len(df)
+        self._df = df
+        self.subjects = subjects
+        self._boards = {}
+
+    def _board(self, subject=None):
+        """(positions best-first, negated scores in that order, place by position)."""
+        board = self._boards.get(subject)
+        if board is None:
+            column = "Percentage" if subject is None else subject
+            scores = self._df[column].to_numpy(dtype=float)
+            candidates = (
+                np.arange(self.n_rows)
+                if subject is None
+                else np.flatnonzero(scores > 0)
+            )
+            # negated so the scores ascend and ties keep frame order
+            negated = -scores[candidates]
+            order = np.argsort(negated, kind="stable")
+            positions = candidates[order]
+            place = np.full(self.n_rows, -1, dtype=np.int64)
+            place[positions] = np.arange(len(positions))
+            board = (positions, negated[order], place)
+            self._boards[subject] = board
+        return board
+
+    def size(self, subject=None):
+        return len(self._board(subject)[0])
+
+    def top(self, k, subject=None):
+        return self._board(subject)[0][:k]
+
+    def window(self, first, last, subject=None):
+        """Positions at 0-based places first..last inclusive."""
+        return self._board(subject)[0][first : last + 1]
+
+    def place_of(self, position, subject=None):
+        """0-based place of a row position, or None if it isn't on the board."""
+        place = int(self._board(subject)[2][position])
+        return place if place >= 0 else None
+
+    def ranks(self, scores, subject=None):
+        # ties share the worst place, as the Rank column does
+        negated = self._board(subject)[1]
+        return np.searchsorted(negated, -np.asarray(scores, dtype=float), side="right")
+
+    def percentile(self, score, subject=None):
+        """Share of the board scoring below `score`, ties counted as half."""
+        negated = self._board(subject)[1]
+        if len(negated) == 0:
+            return None
+        at_least = np.searchsorted(negated, -score, side="right")
+        above = np.searchsorted(negated, -score, side="left")
+        below = len(negated) - at_least
+        return float((below + 0.5 * (at_least - above)) / len(negated) * 100)
+
+
 # --- Analyzer class (uses dynamic subjects list) ---
+PERFORMANCE_BINS = [0, 50, 65, 80, 90, 100]
+PERFORMANCE_LABELS = [
+    "Needs Improvement",
+    "Average",
+    "Good",
+    "Excellent",
+    "Outstanding",
+]
+RISK_LABELS = ["High", "Medium", "Low"]
+# Per-subject feedback comment by score: first threshold reached, else the last
+SUBJECT_COMMENT_THRESHOLDS = [90, 75, 60, 45]
+SUBJECT_COMMENTS = [
+    "Outstanding! Deep understanding and accuracy.",
+    "Very good performance, minor improvement possible.",
+    "Satisfactory, but consistency needed.",
+    "Below average, more practice and focus required.",
+    "Critical zone — needs urgent attention.",
+]
+
+
+def risk_levels(percentage, failed):
+    """Risk Level for whole columns at once: High, Medium or Low."""
+    return np.select(
+        [failed | (percentage < 50), percentage < 65],
+        RISK_LABELS[:2],
+        default=RISK_LABELS[2],
+    )
+
+
+def subject_comment_categories(scores):
+    """Index into SUBJECT_COMMENTS for every cell of a (students x subjects) score matrix."""
+    return np.select(
+        [scores >= t for t in SUBJECT_COMMENT_THRESHOLDS],
+        range(len(SUBJECT_COMMENT_THRESHOLDS)),
+        default=len(SUBJECT_COMMENT_THRESHOLDS),
+    )
+
+
+def figure_json(fig):
+    """Plotly figure as JSON that is safe to embed inside a <script> block."""
+    return fig.to_json().replace("</", "<\\/")
+
+
 class PerformanceAnalyzer:
-    def __init__(self, df: pd.DataFrame, subjects=None):
-        self.df = df.copy() if isinstance(df, pd.DataFrame) else pd.DataFrame()
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        subjects=None,
+        preprocess=True,
+        row_by_student=None,
+        percent_of_max=None,
+    ):
+        # Shallow copy: with copy-on-write the caller's frame is never modified
+        self.df = (
+            df.copy(deep=False) if isinstance(df, pd.DataFrame) else pd.DataFrame()
+        )
         self.subjects = subjects or []
-        if not self.df.empty:
-            self._preprocess_data()
+        if preprocess and not self.df.empty:
+            with stage_timer("preprocess"):
+                self._preprocess_data(percent_of_max)
+        if COMPACT_FRAME and not self.df.empty:
+            self._compact()
+        self._memory_report = None
+        if row_by_student is not None:
+            # handed over by with_updated_students for an unchanged row order
+            self._row_by_student = row_by_student
+        else:
+            self._build_student_index()
+        self._sorted_percentages = None
+        # per-snapshot chart caches, filled on first use
+        self._distribution_cache = None
+        self._dashboard_charts_cache = None
+        self._class_average = None
+        self._filter_index = None
+        self._leaderboard = None
+        self._feedback_texts = None
+
+    def _build_student_index(self):
+        # StudentID -> row position, built once per snapshot; first row wins on duplicates
+        if self.df.empty:
+            self._row_by_student = {}
+            return
+        ids = self.df["StudentID"].astype(str).tolist()
+        positions = range(len(ids) - 1, -1, -1)
+        self._row_by_student = dict(zip(reversed(ids), positions))
+
+    def _compact(self):
+        df = self.df
+        for col in ("Name", "Status", "Performance Level", "Risk Level"):
+            if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype("category")
+        # Percentage stays float64 so ranks match a full rebuild exactly
+        for col in list(self.subjects) + ["Total", "MaxTotal"]:
+            if col in df.columns:
+                df[col] = df[col].astype(np.float32)
+        if "Rank" in df.columns:
+            df["Rank"] = df["Rank"].astype(np.int32)
+
+    def memory_report(self):
+        """Bytes used by the analyzer frame, per column."""
+        if self._memory_report is None:
+            usage = (
+                self.df.memory_usage(deep=True, index=False)
+                if not self.df.empty
+                else pd.Series(dtype=int)
+            )
+            self._memory_report = {
+                "compact": COMPACT_FRAME,
+                "rows": len(self.df),
+                "frame_bytes": int(usage.sum()),
+                "columns": {col: int(b) for col, b in usage.items()},
+            }
+        return self._memory_report
 
-    def _preprocess_data(self):
+    def _preprocess_data(self, percent_of_max=None):
         total_marks = len(self.subjects) * 100 if self.subjects else 100
-        # Percentage already computed earlier; but keep calculation to be safe
-        if (
-            "Total" in self.df.columns
-            and "MaxTotal" in self.df.columns
-            and self.df["MaxTotal"].sum() > 0
-        ):
-            self.df["Percentage"] = (self.df["Total"] / self.df["MaxTotal"]) * 100
+        # Percentage already computed earlier; but keep calculation to be safe.
+        # `percent_of_max` overrides the choice for a patch of a larger frame.
+        if percent_of_max is None:
+            percent_of_max = (
+                "Total" in self.df.columns
+                and "MaxTotal" in self.df.columns
+                and self.df["MaxTotal"].sum() > 0
+            )
+        if percent_of_max:
+            # a student without max marks scores 0, as in build_student_pivot
+            max_total = self.df["MaxTotal"]
+            self.df["Percentage"] = (
+                (self.df["Total"] / max_total.where(max_total > 0)).mul(100).fillna(0.0)
+            )
         else:
             # fallback: if MaxTotal not present, assume 100 per subject
             self.df["Percentage"] = (
@@ -281,134 +1043,371 @@ class PerformanceAnalyzer:
                 else 0
             )
         # Rank
-        # Rank
         try:
             # Ensure Percentage is numeric before ranking, replace NaN with 0
             self.df["Percentage"] = pd.to_numeric(
                 self.df["Percentage"], errors="coerce"
             ).fillna(0)
-            self.df["Rank"] = (
-                self.df["Percentage"].rank(method="max", ascending=False).astype(int)
+            self.df["Rank"] = descending_max_rank(
+                self.df["Percentage"].to_numpy(dtype=float)
             )
         except Exception:
             self.df["Rank"] = 0
 
         # Performance Level and Risk Level
-        bins = [0, 50, 65, 80, 90, 100]
-        labels = ["Needs Improvement", "Average", "Good", "Excellent", "Outstanding"]
         try:
             self.df["Performance Level"] = pd.cut(
-                self.df["Percentage"], bins=bins, labels=labels
+                self.df["Percentage"], bins=PERFORMANCE_BINS, labels=PERFORMANCE_LABELS
             )
         except Exception:
             self.df["Performance Level"] = "Unknown"
-        self.df["Risk Level"] = self.df.apply(self._predict_risk_level, axis=1)
-
-    def _predict_risk_level(self, row):
-        if row.get("Status", "Fail") == "Fail" or row.get("Percentage", 0) < 50:
-            return "High"
-        if row.get("Percentage", 0) < 65:
-            return "Medium"
-        return "Low"
-
-    def generate_ai_feedback(self, student_data):
-        # student_data is a pandas Series row
-        feedback_lines = []
-        feedback_lines.append(
-            f" Overall performance level: {student_data.get('Performance Level', 'Unknown')} ({student_data.get('Percentage', 0):.1f}%)."
-        )
-        feedback_lines.append(
-            f" Risk level assessed: {student_data.get('Risk Level', 'Unknown')}. {student_data.get('Feedback', '')}"
-        )
-        # per-subject comments built from numeric values (if subjects available)
-        for subject in self.subjects:
-            score = student_data.get(subject, 0)
-            if score >= 90:
-                comment = f"{subject}: Outstanding! Deep understanding and accuracy."
-            elif score >= 75:
-                comment = (
-                    f"{subject}: Very good performance, minor improvement possible."
-                )
-            elif score >= 60:
-                comment = f"{subject}: Satisfactory, but consistency needed."
-            elif score >= 45:
-                comment = f"{subject}: Below average, more practice and focus required."
+        self.df["Risk Level"] = self._predict_risk_levels()
+
+    def sorted_percentages(self):
+        """All Percentage values ascending; carried from snapshot to snapshot by patches."""
+        if self._sorted_percentages is None:
+            self._sorted_percentages = (
+                np.sort(self.df["Percentage"].to_numpy(dtype=float))
+                if not self.df.empty
+                else np.arange(0, dtype=float)
+            )
+        return self._sorted_percentages
+
+    def with_updated_students(self, df_students, subjects, student_ids):
+        """
+        Return a new analyzer in which the rows of `student_ids` are replaced by
+        `df_students` (pivot rows from load_data_from_mongo for just those students).
+        Rows keep their positions and new students are appended, so the frame is
+        never re-sorted. Only the replaced rows are preprocessed, and only ranks
+        inside the percentage range the change touches are recomputed. Columns
+        are still copied once, because the old snapshot must stay unchanged.
+        A frame without any max marks falls back to 100 per subject for every
+        row, so a change into or out of that case preprocesses the whole frame.
+        """
+        all_subjects = sorted(set(self.subjects) | set(subjects))
+        changed_ids = {str(sid) for sid in student_ids}
+
+        patched = None
+        if isinstance(df_students, pd.DataFrame) and not df_students.empty:
+            patched = df_students.copy()
+            for s in all_subjects:
+                if s not in patched.columns:
+                    patched[s] = 0
+        if self.df.empty:
+            if patched is None:
+                return PerformanceAnalyzer(pd.DataFrame(), subjects=all_subjects)
+            # the first results are the whole frame
+            return PerformanceAnalyzer(
+                patched.sort_values(["StudentID", "Name"], kind="stable").reset_index(
+                    drop=True
+                ),
+                subjects=all_subjects,
+            )
+
+        # Percentage is of MaxTotal only if the merged frame has max marks at all
+        old_max = self.df["MaxTotal"].to_numpy(dtype=float)
+        gone = [
+            self._row_by_student[sid]
+            for sid in changed_ids
+            if sid in self._row_by_student
+        ]
+        merged_max = np.delete(old_max, gone).sum() + (
+            patched["MaxTotal"].sum() if patched is not None else 0
+        )
+        preprocess_all = not (old_max.sum() > 0 and merged_max > 0)
+        if patched is not None and not preprocess_all:
+            patched = PerformanceAnalyzer(
+                patched, subjects=all_subjects, percent_of_max=True
+            ).df
+
+        # Row position of every patched student; new students go after the old rows
+        n_old = n_rows = len(self.df)
+        row_by_student = dict(self._row_by_student)
+        patched_ids = (
+            patched["StudentID"].astype(str).tolist() if patched is not None else []
+        )
+        positions = []
+        for sid in patched_ids:
+            if sid not in row_by_student:
+                row_by_student[sid] = n_rows
+                n_rows += 1
+            positions.append(row_by_student[sid])
+        positions = np.array(positions, dtype=np.int64)
+
+        columns = {}
+        for col in list(self.df.columns) + [
+            s for s in all_subjects if s not in self.df.columns
+        ]:
+            old = (
+                self.df[col]
+                if col in self.df.columns
+                else pd.Series(np.zeros(n_old, dtype=patched[col].dtype), name=col)
+            )
+            values = (
+                patched[col]
+                if patched is not None and col in patched
+                else np.zeros(len(positions))
+            )
+            columns[col] = patch_column(old, positions, values, n_rows)
+        df = pd.DataFrame(columns)
+
+        # Students whose results are all gone: the only case that moves rows
+        removed = [
+            self._row_by_student[sid]
+            for sid in changed_ids - set(patched_ids)
+            if sid in self._row_by_student
+        ]
+        if removed:
+            keep = np.ones(n_rows, dtype=bool)
+            keep[removed] = False
+            df = df[keep].reset_index(drop=True)
+            if not preprocess_all:
+                df["Rank"] = descending_max_rank(df["Percentage"].to_numpy(dtype=float))
+            return PerformanceAnalyzer(
+                df, subjects=all_subjects, preprocess=preprocess_all
+            )
+        if preprocess_all:
+            return PerformanceAnalyzer(
+                df, subjects=all_subjects, row_by_student=row_by_student
+            )
+
+        # Swap the replaced percentages for the new ones in the sorted array
+        old_pct = self.df["Percentage"].to_numpy(dtype=float)
+        pct = df["Percentage"].to_numpy(dtype=float)
+        replaced = np.sort(old_pct[positions[positions < n_old]])
+        added = np.sort(pct[positions])
+        ordered = self.sorted_percentages()
+        at = np.searchsorted(ordered, replaced, side="left")
+        # equal values sit next to each other; remove one slot per occurrence
+        at += np.arange(len(replaced)) - np.searchsorted(replaced, replaced, "left")
+        ordered = np.delete(ordered, at)
+        ordered = np.insert(ordered, np.searchsorted(ordered, added), added)
+
+        # Rank = number of scores >= yours: a score moving between a and b only
+        # changes ranks in [a, b]; an added student raises everyone below it
+        touched = np.concatenate([replaced, added])
+        low = touched.min() if n_rows == n_old else -np.inf
+        affected = (pct >= low) & (pct <= touched.max())
+        affected[positions] = True
+        rank = df["Rank"].to_numpy().copy()
+        rank[affected] = descending_max_rank(pct[affected], ordered)
+        df["Rank"] = rank
+
+        analyzer = PerformanceAnalyzer(
+            df, subjects=all_subjects, preprocess=False, row_by_student=row_by_student
+        )
+        analyzer._sorted_percentages = ordered
+        return analyzer
+
+    def _predict_risk_levels(self):
+        # a missing Status counts as a fail
+        failed = (
+            (self.df["Status"].astype(object) == "Fail").to_numpy()
+            if "Status" in self.df.columns
+            else np.ones(len(self.df), dtype=bool)
+        )
+        return risk_levels(self.df["Percentage"].to_numpy(dtype=float), failed)
+
+    def _feedback_lines(self, percentages, levels, risks, scores, feedback=""):
+        """
+        Feedback text for many students at once: `scores` is their
+        (students x subjects) matrix, the other arguments one value each.
+        """
+        categories = subject_comment_categories(scores)
+        # every possible bullet per subject, picked by category per student
+        bullets = [
+            np.array([f"• {subject}: {comment}" for comment in SUBJECT_COMMENTS])[
+                categories[:, j]
+            ]
+            for j, subject in enumerate(self.subjects)
+        ]
+        texts = []
+        for i, (pct, level, risk) in enumerate(zip(percentages, levels, risks)):
+            lines = [
+                f" Overall performance level: {level} ({pct:.1f}%).",
+                f" Risk level assessed: {risk}. {feedback}",
+            ]
+            lines.extend(column[i] for column in bullets)
+            texts.append("\n".join(lines))
+        return texts
+
+    def feedback_texts(self):
+        """
+        Generated feedback for every row, built in one batch and cached per
+        snapshot. For exports and bulk runs; a single report builds only its row.
+        """
+        if self._feedback_texts is None:
+            if self.df.empty:
+                self._feedback_texts = []
             else:
-                comment = f"{subject}: Critical zone — needs urgent attention."
-            feedback_lines.append("• " + comment)
-        return "\n".join(feedback_lines)
+                self._feedback_texts = self._feedback_lines(
+                    self.df["Percentage"].to_numpy(dtype=float).tolist(),
+                    self.df["Performance Level"].astype(object).tolist(),
+                    self.df["Risk Level"].astype(object).tolist(),
+                    self.df[self.subjects]
+                    .to_numpy(dtype=float)
+                    .reshape(len(self.df), len(self.subjects)),
+                )
+        return self._feedback_texts
 
-    # Plotly chart functions - reused from your original code, adapted to use data from self.df
+    def generate_ai_feedback(self, student_data, feedback=""):
+        # student_data is a pandas Series row; feedback is the stored exam feedback text
+        if not feedback and self._feedback_texts is not None:
+            # reuse the cohort batch only if an export or bulk run already built it
+            pos = self.student_position(student_data.get("StudentID"))
+            if pos is not None:
+                return self._feedback_texts[pos]
+        scores = [[student_data.get(subject, 0) for subject in self.subjects]]
+        return self._feedback_lines(
+            [student_data.get("Percentage", 0)],
+            [student_data.get("Performance Level", "Unknown")],
+            [student_data.get("Risk Level", "Unknown")],
+            np.array(scores, dtype=float).reshape(1, len(self.subjects)),
+            feedback,
+        )[0]
 
-    def plot_score_distribution(self, df=None):
-        if df is None:
-            df = self.df.copy()
-        if df.empty:
-            return ""
-        df["PercentageRange"] = (
-            (
-                df["Percentage"].replace([np.inf, -np.inf], np.nan)
-            ).fillna(  # remove infinities
-                0
-            )  # replace NaN with 0
-            // 10
-            * 10
-        ).astype(int)
-
-        df_grouped = df.groupby("PercentageRange").size().reset_index(name="Count")
-        df_grouped["Range"] = (
-            df_grouped["PercentageRange"].astype(str)
-            + "-"
-            + (df_grouped["PercentageRange"] + 9).astype(str)
+    # Plotly chart functions. Figures are built from small precomputed aggregates
+    # and shipped as JSON; plotly.js itself is served once from PLOTLY_JS_URL.
+
+    def distribution_counts(self, positions=None):
+        """
+        Counts behind the dashboard charts: students per 10% score range,
+        per Performance Level and per Risk Level, over all rows or only the
+        given row positions. Cached for the full frame.
+        """
+        if positions is None:
+            if self._distribution_cache is None:
+                self._distribution_cache = self._count_distributions()
+            return self._distribution_cache
+        return self._count_distributions(positions)
+
+    def _count_distributions(self, positions=None):
+        if self.df.empty or (positions is not None and len(positions) == 0):
+            return None
+        pct = self.df["Percentage"]
+        levels = self.df["Performance Level"]
+        risks = self.df["Risk Level"]
+        if positions is not None:
+            # take just the three columns, not the whole frame
+            pct, levels, risks = (c.iloc[positions] for c in (pct, levels, risks))
+        pct = pct.replace([np.inf, -np.inf], np.nan).fillna(0).to_numpy()
+        ranges, range_counts = np.unique(
+            (pct // 10 * 10).astype(int), return_counts=True
         )
-        fig = px.bar(
-            df_grouped, x="Range", y="Count", text="Count", title="Score Distribution"
+        levels = levels.astype(object).dropna().value_counts()
+        risks = risks.astype(object).dropna().value_counts()
+        return {
+            "ranges": [f"{r}-{r + 9}" for r in ranges],
+            "range_counts": range_counts.tolist(),
+            "levels": {k: int(levels[k]) for k in PERFORMANCE_LABELS if k in levels},
+            "risks": {k: int(risks[k]) for k in RISK_LABELS if k in risks},
+        }
+
+    def score_distribution_figure(self, positions=None):
+        counts = self.distribution_counts(positions)
+        if counts is None:
+            return None
+        fig = go.Figure(
+            go.Bar(
+                x=counts["ranges"],
+                y=counts["range_counts"],
+                text=counts["range_counts"],
+            )
         )
         fig.update_layout(
+            title="Score Distribution",
+            xaxis_title="Range",
+            yaxis_title="Count",
             template="plotly_dark",
             title_font_color="#ECEFF1",
             paper_bgcolor="#1C1C1C",
             plot_bgcolor="#1C1C1C",
         )
         fig.update_traces(textposition="outside", textfont_color="#ECEFF1")
-        return fig.to_html(full_html=False)
+        return fig
 
-    def plot_performance_distribution(self, df=None):
-        if df is None:
-            df = self.df
-        if df.empty:
-            return ""
-        fig = px.histogram(
-            df,
-            x="Performance Level",
-            color="Performance Level",
-            title="Performance Level Distribution",
+    def performance_distribution_figure(self, positions=None):
+        counts = self.distribution_counts(positions)
+        if counts is None:
+            return None
+        return self._category_figure(
+            counts["levels"], "Performance Level", "Performance Level Distribution"
         )
-        fig.update_layout(
-            template="plotly_dark",
-            paper_bgcolor="#1C1C1C",
-            plot_bgcolor="#1C1C1C",
-            title_font_color="#ECEFF1",
+
+    def risk_distribution_figure(self, positions=None):
+        counts = self.distribution_counts(positions)
+        if counts is None:
+            return None
+        return self._category_figure(
+            counts["risks"], "Risk Level", "Risk Level Distribution"
         )
-        return fig.to_html(full_html=False)
 
-    def plot_risk_distribution(self, df=None):
-        if df is None:
-            df = self.df
-        if df.empty:
-            return ""
-        fig = px.histogram(
-            df, x="Risk Level", color="Risk Level", title="Risk Level Distribution"
+    @staticmethod
+    def _category_figure(counts, axis_title, title):
+        # one trace per category, like px.histogram(color=...) draws it
+        fig = go.Figure(
+            [go.Bar(x=[name], y=[count], name=name) for name, count in counts.items()]
         )
         fig.update_layout(
+            title=title,
+            xaxis_title=axis_title,
+            yaxis_title="count",
             template="plotly_dark",
             paper_bgcolor="#1C1C1C",
             plot_bgcolor="#1C1C1C",
             title_font_color="#ECEFF1",
         )
-        return fig.to_html(full_html=False)
+        return fig
+
+    def dashboard_charts(self, positions=None):
+        """JSON for the three dashboard figures; cached per snapshot for the full frame."""
+        if positions is None:
+            hit = self._dashboard_charts_cache is not None
+            metrics.inc(
+                "dashboard_cache_requests_total",
+                cache="dashboard_charts",
+                result="hit" if hit else "miss",
+            )
+            if hit:
+                return self._dashboard_charts_cache
+        charts = self._build_dashboard_charts(positions)
+        if positions is None:
+            self._dashboard_charts_cache = charts
+        return charts
+
+    def _build_dashboard_charts(self, positions=None):
+        with stage_timer("plotly"):
+            figures = [
+                self.score_distribution_figure(positions),
+                self.performance_distribution_figure(positions),
+                self.risk_distribution_figure(positions),
+            ]
+            return [figure_json(fig) for fig in figures if fig is not None]
+
+    def warm(self, previous=None):
+        """
+        Build the /filter index and the dashboard charts before the snapshot is
+        published, so the first request after a rebuild doesn't pay for them.
+        `previous` is the analyzer being replaced; its name postings are reused.
+        """
+        if self.df.empty:
+            return
+        if self._filter_index is None:
+            base = previous._filter_index if previous is not None else None
+            self._filter_index = StudentFilterIndex(self.df, self.subjects, base)
+        if self._dashboard_charts_cache is None:
+            self._dashboard_charts_cache = self._build_dashboard_charts()
+
+    def class_average(self):
+        if self._class_average is None:
+            self._class_average = (
+                self.df[self.subjects].mean()
+                if self.subjects
+                else pd.Series(dtype=float)
+            )
+        return self._class_average
 
-    def plot_student_marks(self, student_data):
+    def student_marks_figure(self, student_data):
         fig = px.bar(
             x=self.subjects,
             y=[student_data.get(sub, 0) for sub in self.subjects],
@@ -422,12 +1421,15 @@ class PerformanceAnalyzer:
             title_font_color="#ECEFF1",
         )
         fig.update_traces(textposition="auto", textfont_color="#ECEFF1")
-        return fig.to_html(full_html=False)
+        return fig
 
-    def plot_student_vs_class(self, student_data):
-        class_avg = self.df[self.subjects].mean() if self.subjects else []
+    def student_vs_class_figure(self, student_data):
         fig = go.Figure()
-        fig.add_trace(go.Bar(x=self.subjects, y=class_avg, name="Class Average"))
+        fig.add_trace(
+            go.Bar(
+                x=self.subjects, y=self.class_average().tolist(), name="Class Average"
+            )
+        )
         fig.add_trace(
             go.Bar(
                 x=self.subjects,
@@ -444,9 +1446,9 @@ class PerformanceAnalyzer:
             plot_bgcolor="#1C1C1C",
             title_font_color="#ECEFF1",
         )
-        return fig.to_html(full_html=False)
+        return fig
 
-    def plot_student_pie(self, student_data):
+    def student_pie_figure(self, student_data):
         fig = px.pie(
             values=[student_data.get(sub, 0) for sub in self.subjects],
             names=self.subjects,
@@ -456,47 +1458,1463 @@ class PerformanceAnalyzer:
         fig.update_layout(
             template="plotly_dark", paper_bgcolor="#1C1C1C", title_font_color="#ECEFF1"
         )
-        return fig.to_html(full_html=False)
+        return fig
+
+    def student_charts(self, student_data):
+        with stage_timer("plotly"):
+            return [
+                figure_json(self.student_marks_figure(student_data)),
+                figure_json(self.student_vs_class_figure(student_data)),
+                figure_json(self.student_pie_figure(student_data)),
+            ]
+
+    # --- Student table: filtering, sorting and bulk serialization ---
+
+    @property
+    def filter_index(self):
+        if self._filter_index is None:
+            self._filter_index = StudentFilterIndex(self.df, self.subjects)
+        return self._filter_index
+
+    @property
+    def leaderboard(self):
+        if self._leaderboard is None:
+            self._leaderboard = StudentLeaderboard(self.df, self.subjects)
+        return self._leaderboard
+
+    def student_position(self, student_id):
+        return self._row_by_student.get(str(student_id))
+
+    def filter_positions(
+        self, performance=None, risk=None, search=None, subject=None, below=None
+    ):
+        """Row positions (frame order) of students matching the dashboard filters."""
+        if self.df.empty:
+            return np.arange(0)
+        index = self.filter_index
+        candidates = []
+        if subject:
+            if subject not in self.subjects:
+                return np.arange(0)
+            candidates.append(index.subject_positions(subject, below))
+        if performance:
+            candidates.append(index.level_positions.get(performance, np.arange(0)))
+        if risk:
+            candidates.append(index.risk_positions.get(risk, np.arange(0)))
+        positions = intersect_positions(candidates, len(self.df))
+        if search:
+            by_id = self._row_by_student.get(search)
+            by_name = index.name_positions(search, within=positions)
+            if by_id is not None and by_id not in by_name:
+                if np.isin(by_id, positions):
+                    by_name = np.sort(np.append(by_name, by_id))
+            positions = by_name
+        return positions
+
+    def sortable_columns(self):
+        return ["Percentage", "Rank", "Name", "Total", "StudentID"] + list(
+            self.subjects
+        )
+
+    def sort_positions(self, positions, sort="Rank", descending=False):
+        if sort not in self.sortable_columns():
+            raise ValueError(f"Cannot sort by {sort!r}")
+        if self.df.empty:
+            return positions
+        values = self.df[sort].to_numpy()[positions]
+        if values.dtype == object:
+            values = values.astype(str)
+        order = np.argsort(values, kind="stable")
+        if descending:
+            order = order[::-1]
+        return positions[order]
+
+    def table_columns(self):
+        return [
+            "StudentID",
+            "Name",
+            "Percentage",
+            "Rank",
+            "Status",
+            "Performance Level",
+            "Risk Level",
+            "Total",
+            "MaxTotal",
+        ] + list(self.subjects)
+
+    def rows(self, positions, columns=None):
+        """
+        Records for the given row positions, serialized column by column
+        (one tolist() per column) instead of row by row.
+        """
+        columns = columns or self.table_columns()
+        if self.df.empty or len(positions) == 0:
+            return []
+        page = self.df.iloc[positions]
+        values = []
+        for col in columns:
+            series = page[col]
+            if not pd.api.types.is_numeric_dtype(series):
+                series = series.astype(object).where(series.notna(), None)
+            values.append(series.tolist())
+        return [dict(zip(columns, row)) for row in zip(*values)]
 
     def get_student_data(self, student_id):
-        df_student = self.df[self.df["StudentID"] == str(student_id)]
-        if df_student.empty:
+        pos = self._row_by_student.get(str(student_id))
+        if pos is None:
             return None
-        return df_student.iloc[0]
+        return self.df.iloc[pos]
+
+
+# --- Per-student details, fetched only when a report needs them ---
+def student_details_pipeline(student_ids):
+    """Exam results with subject, feedback and evaluationDetails for some students."""
+    # Match the stored ObjectId directly so the studentId index is used
+    return [
+        {"$match": {"studentId": {"$in": student_id_values(student_ids)}}},
+        {
+            "$lookup": {
+                "from": EXAMS_COLLECTION,
+                "localField": "examId",
+                "foreignField": "_id",
+                "as": "exam",
+            }
+        },
+        {"$unwind": {"path": "$exam", "preserveNullAndEmptyArrays": True}},
+        {
+            "$lookup": {
+                "from": SUBJECTS_COLLECTION,
+                "localField": "exam.subject",
+                "foreignField": "_id",
+                "as": "subject",
+            }
+        },
+        {"$unwind": {"path": "$subject", "preserveNullAndEmptyArrays": True}},
+        {
+            "$project": {
+                "_id": {"$toString": "$_id"},
+                "studentId": {"$toString": "$studentId"},
+                "examTitle": "$exam.title",
+                "subjectName": "$subject.name",
+                "totalMarksObtained": {"$ifNull": ["$totalMarksObtained", 0]},
+                "totalMaxMarks": {"$ifNull": ["$totalMaxMarks", 0]},
+                "percentage": {"$ifNull": ["$percentage", 0]},
+                "feedback": {"$ifNull": ["$feedback", ""]},
+                "evaluationDetails": {"$ifNull": ["$evaluationDetails", []]},
+                "createdAt": 1,
+            }
+        },
+    ]
+
+
+class StudentDetailsUnavailable(Exception):
+    """Raised when a student's detail records can't be read; nothing is cached."""
+
+
+def fetch_student_details(student_id):
+    try:
+        with stage_timer("mongo_details"):
+            return list(collection.aggregate(student_details_pipeline([student_id])))
+    except Exception as e:
+        print("Error fetching detailed records for report:", e)
+        raise StudentDetailsUnavailable(str(e)) from e
+
+
+class StudentDetailsCache:
+    """
+    Small thread-safe LRU of per-student detail records. Entries are dropped
+    when the student's results change and cleared on every full rebuild.
+    """
+
+    def __init__(self, maxsize=STUDENT_DETAILS_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, student_id, loader):
+        key = str(student_id)
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                metrics.inc(
+                    "dashboard_cache_requests_total",
+                    cache="student_details",
+                    result="hit",
+                )
+                return self._items[key]
+        metrics.inc(
+            "dashboard_cache_requests_total", cache="student_details", result="miss"
+        )
+        value = loader(key)
+        with self._lock:
+            self._items[key] = value
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return value
+
+    def invalidate(self, student_ids):
+        with self._lock:
+            for sid in student_ids:
+                self._items.pop(str(sid), None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+student_details_cache = StudentDetailsCache()
 
 
 # --- Live Data Loader used by routes ---
-def get_latest_analyzer():
+def current_high_water():
+    """Latest EXAMRESULTS_CHANGE_FIELD value in examresults, or None if empty."""
+    doc = collection.find_one(
+        {EXAMRESULTS_CHANGE_FIELD: {"$exists": True}},
+        {EXAMRESULTS_CHANGE_FIELD: 1},
+        sort=[(EXAMRESULTS_CHANGE_FIELD, -1)],
+    )
+    return doc.get(EXAMRESULTS_CHANGE_FIELD) if doc else None
+
+
+def build_analyzer():
+    """
+    Full rebuild. Returns (analyzer, high-water mark read before the scan).
+    Errors propagate so SnapshotManager keeps serving the last good snapshot.
+    """
+    # Read the mark first: anything written during the scan is picked up again
+    high_water = current_high_water()
+    change_feed.reset(high_water)
+    student_details_cache.clear()
+    df, subjects = load_data_from_mongo()
+    analyzer = PerformanceAnalyzer(df, subjects=subjects)
+    trend_rollups.update()
+    return analyzer, high_water
+
+
+def empty_analyzer():
+    return PerformanceAnalyzer(pd.DataFrame(), subjects=[])
+
+
+class ExamResultChangeFeed:
+    """
+    Reports which students' examresults were inserted or updated since a
+    high-water mark. Uses a change stream when the deployment supports one
+    and falls back to polling EXAMRESULTS_CHANGE_FIELD otherwise (standalone
+    servers, local stand-ins). Deletions are only picked up by the TTL rebuild.
+    """
+
+    def __init__(self, use_change_stream=SNAPSHOT_CHANGE_STREAM):
+        self._use_change_stream = use_change_stream
+        self._stream = None
+        # _ids already applied at exactly the current high-water timestamp
+        self._boundary_ids = set()
+
+    def reset(self, high_water):
+        """Start tracking from `high_water`, as read just before a full build."""
+        self.close()
+        self._boundary_ids = set()
+        if high_water is not None:
+            self._boundary_ids = {
+                doc["_id"]
+                for doc in collection.find(
+                    {EXAMRESULTS_CHANGE_FIELD: high_water}, {"_id": 1}
+                )
+            }
+
+    def changed_since(self, high_water):
+        """Return (set of studentId values, new high-water mark)."""
+        if self._use_change_stream:
+            try:
+                return self._drain_stream(high_water)
+            except Exception as e:
+                print(f"Change stream unavailable, falling back to polling: {e}")
+                self.close()
+                self._use_change_stream = False
+        return self._poll(high_water)
+
+    def close(self):
+        if self._stream is not None:
+            try:
+                self._stream.close()
+            except Exception:
+                pass
+            self._stream = None
+
+    def _poll(self, high_water):
+        student_ids = set()
+        # $gte so writes sharing the boundary timestamp are not lost; the ones
+        # already applied are skipped by _id
+        cursor = collection.find(
+            {EXAMRESULTS_CHANGE_FIELD: {"$gte": high_water}},
+            {"studentId": 1, EXAMRESULTS_CHANGE_FIELD: 1},
+        )
+        docs = [
+            doc
+            for doc in cursor
+            if not (
+                doc.get(EXAMRESULTS_CHANGE_FIELD) == high_water
+                and doc["_id"] in self._boundary_ids
+            )
+        ]
+        previous = high_water
+        for doc in docs:
+            student_ids.add(doc.get("studentId"))
+            high_water = _later(high_water, doc.get(EXAMRESULTS_CHANGE_FIELD))
+        if high_water != previous:
+            self._boundary_ids = set()
+        self._boundary_ids |= {
+            doc["_id"]
+            for doc in docs
+            if doc.get(EXAMRESULTS_CHANGE_FIELD) == high_water
+        }
+        return student_ids, high_water
+
+    def _drain_stream(self, high_water):
+        student_ids = set()
+        if self._stream is None:
+            self._stream = collection.watch(
+                [
+                    {
+                        "$match": {
+                            "operationType": {"$in": ["insert", "update", "replace"]}
+                        }
+                    }
+                ],
+                full_document="updateLookup",
+                max_await_time_ms=100,
+            )
+            # Cover writes made between the snapshot build and opening the stream
+            student_ids, high_water = self._poll(high_water)
+        while True:
+            change = self._stream.try_next()
+            if change is None:
+                break
+            doc = change.get("fullDocument") or {}
+            if doc:
+                student_ids.add(doc.get("studentId"))
+            high_water = _later(high_water, doc.get(EXAMRESULTS_CHANGE_FIELD))
+        return student_ids, high_water
+
+
+def _later(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return max(a, b)
+
+
+change_feed = ExamResultChangeFeed()
+
+
+def update_analyzer(snapshot):
+    """
+    Incremental update: re-aggregate only the students whose examresults changed
+    since the snapshot's high-water mark and splice them into a new analyzer.
+    Returns (analyzer, high_water), or None when nothing changed.
+    """
+    if snapshot.high_water is None:
+        # Nothing was there at build time; do a full build once data shows up
+        return build_analyzer() if current_high_water() is not None else None
+
+    student_ids, high_water = change_feed.changed_since(snapshot.high_water)
+    # Results without a student, or whose student is gone, share one "" row
+    # that only a full scan can re-aggregate
+    if student_ids & {None, ""}:
+        return build_analyzer()
+    if not student_ids:
+        return None
+    student_details_cache.invalidate(student_ids)
+    trend_rollups.update(student_ids)
+
+    df_students, subjects = load_data_from_mongo(
+        match={"studentId": {"$in": student_id_values(student_ids)}}
+    )
+    if not df_students.empty and (df_students["StudentID"] == "").any():
+        return build_analyzer()
+    analyzer = snapshot.analyzer.with_updated_students(
+        df_students, subjects, student_ids
+    )
+    return analyzer, high_water
+
+
+class AnalyzerSnapshot:
+    """
+    One immutable analyzer build. Routes only read from it; a newer build
+    replaces the whole snapshot instead of mutating this one.
+    """
+
+    def __init__(
+        self, analyzer, version, built_at, build_seconds, high_water=None, scope=None
+    ):
+        self.analyzer = analyzer
+        self.version = version
+        self.built_at = built_at
+        self.build_seconds = build_seconds
+        self.high_water = high_water
+        # AnalysisScope.key() for scoped snapshots, None for the full dataset
+        self.scope = scope
+
+    def age(self):
+        return time.time() - self.built_at
+
+
+class SnapshotUnavailable(Exception):
+    """Raised by SnapshotManager.get() when no snapshot has been built or published."""
+
+
+class SnapshotStore:
+    """
+    Snapshot columns published as .npy files under `directory`, written as
+    `v<version>/` with `current.json` swapped atomically to point at it.
+
+    Persisted across restarts, so a new process serves the last snapshot
+    while MongoDB catches up. With `shared=True` several uvicorn workers use
+    one directory: the worker holding `builder.lock` builds and publishes,
+    the others map the columns read-only (np.load mmap_mode="r"), so the page
+    cache holds a single copy of the numeric data.
+
+    Text columns are stored as categorical codes with their categories in
+    meta.json. Superseded version directories are removed after each publish;
+    workers still mapping them keep their open files.
+    """
+
+    SCHEMA_VERSION = 1
+    POINTER = "current.json"
+
+    def __init__(self, directory, shared=False):
+        if shared and fcntl is None:
+            raise RuntimeError(
+                "A shared snapshot directory needs fcntl.flock, which this "
+                "platform lacks; use SNAPSHOT_PERSIST_DIR with a single worker"
+            )
+        self.directory = directory
+        self.shared = shared
+        os.makedirs(directory, exist_ok=True)
+        self._lock_file = None
+        self._mutex = threading.Lock()
+
+    @property
+    def is_builder(self):
+        return not self.shared or self._lock_file is not None
+
+    def try_acquire_builder(self):
+        """Take the builder role if no other live worker holds it."""
+        with self._mutex:
+            if self.is_builder:
+                return True
+            lock_file = open(os.path.join(self.directory, "builder.lock"), "a+")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return False
+            # Released by the OS when this process exits, letting another worker take over
+            self._lock_file = lock_file
+            print(f"Worker {os.getpid()} is the snapshot builder")
+            return True
+
+    def read_pointer(self):
+        try:
+            with open(os.path.join(self.directory, self.POINTER)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def latest_version(self):
+        pointer = self.read_pointer()
+        return pointer["version"] if pointer else 0
+
+    def publish(self, snapshot):
+        name = f"v{snapshot.version:08d}"
+        staging = os.path.join(self.directory, f".{name}.{os.getpid()}")
+        write_snapshot_dir(staging, snapshot)
+        target = os.path.join(self.directory, name)
+        shutil.rmtree(target, ignore_errors=True)
+        os.rename(staging, target)
+
+        pointer_tmp = os.path.join(self.directory, f".{self.POINTER}.{os.getpid()}")
+        with open(pointer_tmp, "w") as f:
+            json.dump({"version": snapshot.version, "path": name}, f)
+        os.replace(pointer_tmp, os.path.join(self.directory, self.POINTER))
+
+        for entry in os.listdir(self.directory):
+            if entry.startswith("v") and entry != name:
+                shutil.rmtree(os.path.join(self.directory, entry), ignore_errors=True)
+
+    def load(self, newer_than=0):
+        """The published snapshot if its version is above `newer_than`, else None."""
+        pointer = self.read_pointer()
+        if pointer is None or pointer["version"] <= newer_than:
+            return None
+        try:
+            return read_snapshot_dir(
+                os.path.join(self.directory, pointer["path"]), mmap=True
+            )
+        except FileNotFoundError:
+            # Replaced between reading the pointer and opening it; next poll catches up
+            return None
+
+
+def write_snapshot_dir(path, snapshot):
+    """Write an AnalyzerSnapshot as one .npy file per column plus meta.json."""
+    os.makedirs(path, exist_ok=True)
+    df = snapshot.analyzer.df
+    columns = []
+    for i, (name, series) in enumerate(df.items()):
+        entry = {"name": name, "file": f"{i}.npy"}
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            values = series.cat
+            entry.update(
+                kind="category",
+                categories=values.categories.tolist(),
+                ordered=bool(values.ordered),
+            )
+            data = values.codes.to_numpy()
+        elif pd.api.types.is_numeric_dtype(series.dtype):
+            entry["kind"] = "numeric"
+            data = series.to_numpy()
+        else:
+            codes, uniques = pd.factorize(series.astype(str))
+            entry.update(kind="string", categories=uniques.tolist())
+            data = codes.astype(np.int32)
+        np.save(os.path.join(path, entry["file"]), data, allow_pickle=False)
+        columns.append(entry)
+
+    meta = {
+        "schema": SnapshotStore.SCHEMA_VERSION,
+        "version": snapshot.version,
+        "built_at": snapshot.built_at,
+        "build_seconds": snapshot.build_seconds,
+        "high_water": snapshot.high_water,
+        "subjects": list(snapshot.analyzer.subjects),
+        "rows": len(df),
+        "columns": columns,
+    }
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        f.write(json_util.dumps(meta))
+
+
+def read_snapshot_dir(path, mmap=False):
+    """Inverse of write_snapshot_dir; numeric columns stay memory-mapped when `mmap`."""
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json_util.loads(f.read())
+    if meta.get("schema") != SnapshotStore.SCHEMA_VERSION:
+        raise ValueError(f"Unsupported snapshot schema {meta.get('schema')!r}")
+
+    data = {}
+    for entry in meta["columns"]:
+        values = np.load(
+            os.path.join(path, entry["file"]),
+            mmap_mode="r" if mmap else None,
+            allow_pickle=False,
+        )
+        if entry["kind"] == "category":
+            values = pd.Categorical.from_codes(
+                values, categories=entry["categories"], ordered=entry["ordered"]
+            )
+        elif entry["kind"] == "string":
+            values = np.asarray(entry["categories"], dtype=object)[values]
+        data[entry["name"]] = values
+    df = pd.DataFrame(data, copy=False) if data else pd.DataFrame()
+
+    analyzer = PerformanceAnalyzer(df, subjects=meta["subjects"], preprocess=False)
+    return AnalyzerSnapshot(
+        analyzer,
+        version=meta["version"],
+        built_at=meta["built_at"],
+        build_seconds=meta["build_seconds"],
+        high_water=meta["high_water"],
+    )
+
+
+class SnapshotManager:
+    """
+    Holds the current AnalyzerSnapshot and rebuilds it in a background thread
+    every `ttl` seconds or when invalidate() is called. Between full rebuilds,
+    `updater` is polled every `poll_interval` seconds to patch in new results.
+    Readers never wait on MongoDB except for the very first build.
+    A failed build or update keeps the current snapshot; only when there is
+    none yet is `fallback()` served, and that analyzer is never persisted.
+    """
+
+    def __init__(
+        self,
+        builder,
+        ttl=SNAPSHOT_TTL_SECONDS,
+        updater=None,
+        poll_interval=SNAPSHOT_POLL_SECONDS,
+        store=None,
+        on_load=None,
+        fallback=None,
+    ):
+        self._builder = builder
+        self._updater = updater
+        self._fallback = fallback
+        # (kind, message, time.time()) of the most recent failed build or update
+        self.last_error = None
+        # With a SnapshotStore only the worker holding its lock builds;
+        # the others load what it publishes and call on_load(snapshot)
+        self._store = store
+        self._on_load = on_load
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        self._snapshot = None
+        self._version = 0
+        self._last_full_build = 0.0
+        self._build_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def current(self):
+        """The latest snapshot, or None before the first build; never builds."""
+        return self._snapshot
+
+    @property
+    def is_builder(self):
+        return self._store is None or self._store.is_builder
+
+    def get(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self.refresh()
+        self.start()
+        if snapshot is None:
+            raise SnapshotUnavailable("No snapshot has been published yet")
+        return snapshot
+
+    def _claim_builder(self):
+        return self._store is None or self._store.try_acquire_builder()
+
+    def _load_published(self):
+        """Swap in the builder worker's latest published snapshot if it is newer."""
+        with self._build_lock:
+            current = self._snapshot
+            published = self._store.load(
+                newer_than=current.version if current is not None else 0
+            )
+            if published is not None:
+                published.analyzer.warm(current.analyzer if current else None)
+                metrics.inc("dashboard_snapshot_builds_total", kind="published")
+                self._snapshot = published
+                self._version = published.version
+                # Counts towards the TTL, so a takeover patches instead of rebuilding
+                self._last_full_build = time.monotonic() - published.age()
+                if self._on_load is not None:
+                    self._on_load(published)
+            return self._snapshot
+
+    def restore(self):
+        """Serve the snapshot last written to the store until MongoDB catches up."""
+        if self._store is None or self._snapshot is not None:
+            return self._snapshot
+        if not self._claim_builder():
+            return self._load_published()
+        with self._build_lock:
+            try:
+                snapshot = self._store.load()
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Ignoring unreadable persisted snapshot: {e}")
+                return None
+            if snapshot is not None and self._snapshot is None:
+                metrics.inc("dashboard_snapshot_builds_total", kind="restored")
+                self._snapshot = snapshot
+                self._version = snapshot.version
+                # Reconcile with apply_updates(); the TTL rebuild catches deletions
+                self._last_full_build = time.monotonic()
+                print(
+                    f"Restored snapshot v{snapshot.version} "
+                    f"({len(snapshot.analyzer.df)} rows, {snapshot.age():.0f}s old)"
+                )
+                # Served as soon as it is loaded; warmed right after on this thread
+                snapshot.analyzer.warm()
+            return self._snapshot
+
+    def refresh(self):
+        if not self._claim_builder():
+            return self._load_published()
+        # Only one build runs at a time; callers that queued behind it reuse its result
+        seen = self._snapshot
+        with self._build_lock:
+            if self._snapshot is not None and self._snapshot is not seen:
+                return self._snapshot
+            started = time.perf_counter()
+            try:
+                analyzer, high_water = self._builder()
+            except Exception as e:
+                # Retried after the TTL rather than in a tight loop
+                self._last_full_build = time.monotonic()
+                self._record_failure("full", e)
+                if self._snapshot is not None:
+                    return self._snapshot
+                if self._fallback is None:
+                    raise
+                return self._publish(
+                    self._fallback(), None, started, kind="full", persist=False
+                )
+            self._last_full_build = time.monotonic()
+            return self._publish(analyzer, high_water, started, kind="full")
+
+    def apply_updates(self):
+        """Patch the current snapshot with whatever the updater reports."""
+        if not self._claim_builder():
+            return self._load_published()
+        if self._updater is None or self._snapshot is None:
+            return self._snapshot
+        with self._build_lock:
+            started = time.perf_counter()
+            try:
+                result = self._updater(self._snapshot)
+            except Exception as e:
+                self._record_failure("incremental", e)
+                return self._snapshot
+            if result is None:
+                return self._snapshot
+            analyzer, high_water = result
+            return self._publish(analyzer, high_water, started, kind="incremental")
+
+    def _record_failure(self, kind, error):
+        self.last_error = (kind, str(error), time.time())
+        metrics.inc("dashboard_snapshot_build_failures_total", kind=kind)
+        current = self._snapshot
+        serving = f"still serving v{current.version}" if current else "no snapshot yet"
+        print(f"Snapshot {kind} build failed ({serving}): {error}")
+
+    def _publish(self, analyzer, high_water, started, kind, persist=True):
+        current = self._snapshot
+        analyzer.warm(current.analyzer if current is not None else None)
+        if self._store is not None:
+            # Keep counting from the last published version after a takeover/restart
+            self._version = max(self._version, self._store.latest_version())
+        self._version += 1
+        snapshot = AnalyzerSnapshot(
+            analyzer,
+            version=self._version,
+            built_at=time.time(),
+            build_seconds=time.perf_counter() - started,
+            high_water=high_water,
+        )
+        metrics.inc("dashboard_snapshot_builds_total", kind=kind)
+        metrics.observe(
+            "dashboard_snapshot_build_seconds", snapshot.build_seconds, kind=kind
+        )
+        if self._store is not None and persist:
+            self._store.publish(snapshot)
+        self._snapshot = snapshot
+        return snapshot
+
+    def invalidate(self):
+        self._wake.set()
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="snapshot-refresh", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+
+    def _run(self):
+        incremental = self._updater is not None and self.poll_interval > 0
+        while not self._stopped.is_set():
+            until_full = self._last_full_build + self.ttl - time.monotonic()
+            timeout = max(until_full, 0)
+            if incremental:
+                timeout = min(timeout, self.poll_interval)
+            if not self.is_builder:
+                # apply_updates() retries the builder lock, else loads newer versions
+                timeout = SNAPSHOT_SHARED_POLL_SECONDS
+            woken = self._wake.wait(timeout=timeout)
+            self._wake.clear()
+            if self._stopped.is_set():
+                break
+            try:
+                if woken or time.monotonic() - self._last_full_build >= self.ttl:
+                    self.refresh()
+                elif incremental or not self.is_builder:
+                    self.apply_updates()
+            except Exception as e:
+                print(f"Background snapshot refresh failed: {e}")
+
+
+if SNAPSHOT_SHARED_DIR:
+    snapshot_store = SnapshotStore(SNAPSHOT_SHARED_DIR, shared=True)
+elif SNAPSHOT_PERSIST_DIR:
+    snapshot_store = SnapshotStore(SNAPSHOT_PERSIST_DIR)
+else:
+    snapshot_store = None
+
+snapshot_manager = SnapshotManager(
+    build_analyzer,
+    updater=update_analyzer,
+    store=snapshot_store,
+    # Published patches don't say which students changed, so drop all cached details
+    on_load=lambda snapshot: student_details_cache.clear(),
+    # Empty dashboards only until the first build succeeds
+    fallback=empty_analyzer,
+)
+
+
+def require_mongo():
+    """Raise the route's 503/500 unless MongoDB is connected."""
+    if collection is not None:
+        return
+    if mongo_status in ("pending", "connecting"):
+        raise HTTPException(status_code=503, detail="Service is warming up.")
+    raise HTTPException(
+        status_code=500, detail="Database connection failed or not initialized."
+    )
+
+
+def get_latest_snapshot():
     if collection is None:
+        current = snapshot_manager.current
+        if current is not None:
+            # Restored from disk or published by the builder worker; served
+            # however MongoDB is doing in this process
+            return current
+        if mongo_status in ("pending", "connecting"):
+            raise HTTPException(status_code=503, detail="Service is warming up.")
         raise HTTPException(
             status_code=500, detail="Database connection failed or not initialized."
         )
     try:
-        df, subjects = load_data_from_mongo()
-        analyzer = PerformanceAnalyzer(df, subjects=subjects)
-        return analyzer
-    except ValueError as e:
-        print(f"Data loading error: {e}")
+        return snapshot_manager.get()
+    except SnapshotUnavailable:
+        raise HTTPException(status_code=503, detail="Service is warming up.")
+
+
+def get_latest_analyzer():
+    return get_latest_snapshot().analyzer
+
+
+# --- Scoped analytics: snapshots over one exam, subject, department or date range ---
+class AnalysisScope:
+    """
+    Which examresults a dashboard covers. Every field is optional; subject and
+    department are resolved to exam ids so the whole scope becomes one indexed
+    $match on examId/createdAt ahead of the $lookup stages.
+    """
+
+    def __init__(
+        self,
+        exam_id=None,
+        subject=None,
+        department=None,
+        created_from=None,
+        created_to=None,
+    ):
+        self.exam_id = exam_id
+        self.subject = subject
+        self.department = department
+        self.created_from = created_from
+        self.created_to = created_to
+
+    def key(self):
+        return (
+            self.exam_id,
+            self.subject,
+            self.department,
+            self.created_from.isoformat() if self.created_from else None,
+            self.created_to.isoformat() if self.created_to else None,
+        )
+
+    def params(self):
+        """Query parameters reproducing this scope, for links and /filter calls."""
+        names = ("examId", "subjectId", "department", "from", "to")
+        return {name: value for name, value in zip(names, self.key()) if value}
+
+    def query_suffix(self):
+        params = self.params()
+        return "?" + urlencode(params) if params else ""
+
+
+def parse_scope_date(value, name, end=False):
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name} date: {value}")
+    if end and len(value) == 10:
+        # A bare date as the upper bound includes that whole day
+        parsed += timedelta(days=1)
+    return parsed
+
+
+def scope_params(
+    exam_id: Optional[str] = Query(None, alias="examId"),
+    subject: Optional[str] = Query(None, alias="subjectId"),
+    department: Optional[str] = Query(None),
+    created_from: Optional[str] = Query(None, alias="from"),
+    created_to: Optional[str] = Query(None, alias="to"),
+):
+    """Route dependency: an AnalysisScope, or None for the full dataset."""
+    return parse_scope(exam_id, subject, department, created_from, created_to)
+
+
+def parse_scope(exam_id, subject, department, created_from, created_to):
+    exam_id, subject, department, created_from, created_to = (
+        value.strip() if value and value.strip() else None
+        for value in (exam_id, subject, department, created_from, created_to)
+    )
+    if not any((exam_id, subject, department, created_from, created_to)):
+        return None
+    if exam_id and not ObjectId.is_valid(exam_id):
+        raise HTTPException(status_code=400, detail=f"Invalid examId: {exam_id}")
+    return AnalysisScope(
+        exam_id=exam_id,
+        subject=subject,
+        department=department,
+        created_from=parse_scope_date(created_from, "from") if created_from else None,
+        created_to=parse_scope_date(created_to, "to", end=True) if created_to else None,
+    )
+
+
+def subject_lookup_query(subject):
+    """subjects query for a subject given by either its id or its name."""
+    candidates = [{"name": subject}]
+    if ObjectId.is_valid(subject):
+        candidates.append({"_id": ObjectId(subject)})
+    return {"$or": candidates}
+
+
+def scope_match(scope):
+    """The examresults $match for `scope`, or None when no exam falls inside it."""
+    exam_ids = {ObjectId(scope.exam_id)} if scope.exam_id else None
+    if scope.subject or scope.department:
+        subject_query = {}
+        if scope.subject:
+            subject_query.update(subject_lookup_query(scope.subject))
+        if scope.department:
+            faculty_ids = [
+                doc["_id"]
+                for doc in db[FACULTIES_COLLECTION].find(
+                    {"department": scope.department}, {"_id": 1}
+                )
+            ]
+            subject_query["faculty"] = {"$in": faculty_ids}
+        subject_ids = [
+            doc["_id"]
+            for doc in db[SUBJECTS_COLLECTION].find(subject_query, {"_id": 1})
+        ]
+        in_subjects = {
+            doc["_id"]
+            for doc in db[EXAMS_COLLECTION].find(
+                {"subject": {"$in": subject_ids}}, {"_id": 1}
+            )
+        }
+        exam_ids = in_subjects if exam_ids is None else exam_ids & in_subjects
+
+    match = {}
+    if exam_ids is not None:
+        if not exam_ids:
+            return None
+        match["examId"] = {"$in": sorted(exam_ids)}
+    if scope.created_from or scope.created_to:
+        match["createdAt"] = {}
+        if scope.created_from:
+            match["createdAt"]["$gte"] = scope.created_from
+        if scope.created_to:
+            match["createdAt"]["$lt"] = scope.created_to
+    return match
+
+
+def build_scoped_analyzer(scope):
+    match = scope_match(scope)
+    if match is None:
         return PerformanceAnalyzer(pd.DataFrame(), subjects=[])
+    df, subjects = load_data_from_mongo(match=match)
+    return PerformanceAnalyzer(df, subjects=subjects)
+
+
+class ScopedSnapshotCache:
+    """
+    Small thread-safe LRU of per-scope snapshots. A scope is aggregated on
+    first use and again once its snapshot is older than `ttl`; concurrent
+    requests for the same scope wait for one build instead of each running it.
+    """
+
+    def __init__(self, builder, maxsize=SCOPE_CACHE_SIZE, ttl=SCOPE_TTL_SECONDS):
+        self._builder = builder
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._building = {}
+        self._versions = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _fresh(self, key):
+        snapshot = self._items.get(key)
+        if snapshot is not None and snapshot.age() < self.ttl:
+            self._items.move_to_end(key)
+            return snapshot
+        return None
+
+    def get(self, scope):
+        key = scope.key()
+        with self._lock:
+            snapshot = self._fresh(key)
+            build_lock = self._building.setdefault(key, threading.Lock())
+        if snapshot is not None:
+            metrics.inc("dashboard_cache_requests_total", cache="scopes", result="hit")
+            return snapshot
+        metrics.inc("dashboard_cache_requests_total", cache="scopes", result="miss")
+        with build_lock:
+            with self._lock:
+                snapshot = self._fresh(key)
+            return snapshot or self._build(scope, key)
+
+    def _build(self, scope, key):
+        started = time.perf_counter()
+        analyzer = self._builder(scope)
+        build_seconds = time.perf_counter() - started
+        metrics.inc("dashboard_snapshot_builds_total", kind="scoped")
+        metrics.observe(
+            "dashboard_snapshot_build_seconds", build_seconds, kind="scoped"
+        )
+        with self._lock:
+            snapshot = AnalyzerSnapshot(
+                analyzer,
+                next(self._versions),
+                time.time(),
+                build_seconds,
+                scope=key,
+            )
+            self._items[key] = snapshot
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                evicted, _ = self._items.popitem(last=False)
+                self._building.pop(evicted, None)
+        return snapshot
+
+    def __len__(self):
+        return len(self._items)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._building.clear()
+
+
+scoped_snapshots = ScopedSnapshotCache(build_scoped_analyzer)
+
+
+def get_snapshot(scope=None):
+    """The snapshot a route should read: the full one, or the one for `scope`."""
+    if scope is None:
+        return get_latest_snapshot()
+    # Restored snapshots only cover the full dataset; scopes need MongoDB
+    require_mongo()
+    try:
+        return scoped_snapshots.get(scope)
     except Exception as e:
-        print(f"Unexpected error in get_latest_analyzer: {e}")
-        return PerformanceAnalyzer(pd.DataFrame(), subjects=[])
+        print(f"Scoped snapshot build failed for {scope.params()}: {e}")
+        raise HTTPException(status_code=500, detail="Could not load scoped data.")
+
+
+# --- Trend rollups: per student+subject totals by week, month and term ---
+TREND_GRANULARITIES = ("week", "month", "term")
+
+
+def rollup_bucket_expressions(date="$createdAt"):
+    """
+    Bucket start dates per granularity, from plain date operators
+    ($dateTrunc would need MongoDB 5.0).
+    """
+    year, month = {"$year": date}, {"$month": date}
+    day = {
+        "$dateFromParts": {
+            "year": year,
+            "month": month,
+            "day": {"$dayOfMonth": date},
+        }
+    }
+    # $dayOfWeek is 1 for Sunday; step back to Monday
+    days_since_monday = {"$mod": [{"$add": [{"$dayOfWeek": date}, 5]}, 7]}
+    week = {"$subtract": [day, {"$multiply": [days_since_monday, 86400000]}]}
+    # Latest term start at or before the date; before the first one, last year's last
+    term_month = {
+        "$switch": {
+            "branches": [
+                {"case": {"$gte": [month, m]}, "then": m}
+                for m in reversed(TERM_START_MONTHS)
+            ],
+            "default": TERM_START_MONTHS[-1],
+        }
+    }
+    term_year = {
+        "$cond": [
+            {"$gte": [month, TERM_START_MONTHS[0]]},
+            year,
+            {"$subtract": [year, 1]},
+        ]
+    }
+    term = {"$dateFromParts": {"year": term_year, "month": term_month}}
+    return {
+        "week": week,
+        "month": {"$dateFromParts": {"year": year, "month": month}},
+        "term": term,
+    }
+
+
+def rollup_pipeline(rolled_up_at, match=None):
+    """
+    examresults -> one document per student, subject, granularity and bucket,
+    $merge-d into ROLLUP_COLLECTION and stamped with `rolled_up_at`.
+    """
+    buckets = rollup_bucket_expressions()
+    pipeline = [{"$match": match}] if match else []
+    pipeline += [
+        {"$match": {"createdAt": {"$type": "date"}}},
+        {
+            "$lookup": {
+                "from": EXAMS_COLLECTION,
+                "localField": "examId",
+                "foreignField": "_id",
+                "as": "exam",
+            }
+        },
+        {"$unwind": {"path": "$exam", "preserveNullAndEmptyArrays": True}},
+        # every result lands in one bucket per granularity
+        {
+            "$project": {
+                "studentId": 1,
+                "subjectId": "$exam.subject",
+                "Total_Score": {"$ifNull": ["$totalMarksObtained", 0]},
+                "MaxTotal": {"$ifNull": ["$totalMaxMarks", 0]},
+                "buckets": {g: buckets[g] for g in TREND_GRANULARITIES},
+            }
+        },
+        {
+            "$project": {
+                "studentId": 1,
+                "subjectId": 1,
+                "Total_Score": 1,
+                "MaxTotal": 1,
+                "buckets": {"$objectToArray": "$buckets"},
+            }
+        },
+        {"$unwind": "$buckets"},
+        {
+            "$group": {
+                "_id": {
+                    "studentId": "$studentId",
+                    "subjectId": "$subjectId",
+                    "granularity": "$buckets.k",
+                    "bucket": "$buckets.v",
+                },
+                "Total_Score": {"$sum": "$Total_Score"},
+                "MaxTotal": {"$sum": "$MaxTotal"},
+                "results": {"$sum": 1},
+            }
+        },
+        {
+            "$addFields": {
+                "studentId": "$_id.studentId",
+                "subjectId": "$_id.subjectId",
+                "granularity": "$_id.granularity",
+                "bucket": "$_id.bucket",
+                "rolledUpAt": rolled_up_at,
+            }
+        },
+        {
+            "$merge": {
+                "into": ROLLUP_COLLECTION,
+                "on": "_id",
+                "whenMatched": "replace",
+                "whenNotMatched": "insert",
+            }
+        },
+    ]
+    return pipeline
+
+
+class TrendRollups:
+    """
+    Maintains ROLLUP_COLLECTION for the snapshot builder: a full $merge every
+    `rebuild_interval` seconds (which also drops buckets of deleted results)
+    and, in between, a re-roll of just the students the change feed reports.
+    The work runs in its own thread so snapshot builds never wait on it.
+    Trend endpoints only ever read the rollups.
+    """
+
+    def __init__(self, rebuild_interval=ROLLUP_REBUILD_SECONDS):
+        self.rebuild_interval = rebuild_interval
+        self._last_rebuild = 0.0
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._wake = threading.Event()
+        self._thread = None
+
+    @property
+    def rollups(self):
+        return db[ROLLUP_COLLECTION]
+
+    def ensure_indexes(self):
+        self.rollups.create_index([("granularity", 1), ("studentId", 1), ("bucket", 1)])
+        self.rollups.create_index([("granularity", 1), ("subjectId", 1), ("bucket", 1)])
+        self.rollups.create_index([("granularity", 1), ("bucket", 1)])
+
+    def _merge(self, match=None):
+        # Stamp this run so rollups it didn't rewrite can be deleted afterwards
+        rolled_up_at = datetime.now(timezone.utc)
+        collection.aggregate(rollup_pipeline(rolled_up_at, match))
+        stale = {"rolledUpAt": {"$lt": rolled_up_at}}
+        if match:
+            stale.update(match)
+        self.rollups.delete_many(stale)
+
+    def rebuild(self):
+        started = time.perf_counter()
+        # Set first: a failing rebuild waits out the interval instead of retrying
+        self._last_rebuild = time.time()
+        self._merge()
+        print(f"Trend rollups rebuilt in {time.perf_counter() - started:.2f}s")
+
+    def update(self, student_ids=()):
+        """Schedule a full rebuild when due, otherwise a re-roll of `student_ids`."""
+        if not TREND_ROLLUPS:
+            return
+        with self._lock:
+            self._pending |= set(student_ids)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="trend-rollups", daemon=True
+                )
+                self._thread.start()
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            with self._lock:
+                student_ids, self._pending = self._pending, set()
+            try:
+                if time.time() - self._last_rebuild >= self.rebuild_interval:
+                    self.rebuild()
+                elif student_ids:
+                    self._merge({"studentId": {"$in": student_id_values(student_ids)}})
+            except Exception as e:
+                # Trends go stale until the next successful run
+                print(f"Trend rollup update failed: {e}")
+
+    def student_trend(self, student_id, granularity, subject_ids=None):
+        query = {
+            "granularity": granularity,
+            "studentId": {"$in": student_id_values([student_id])},
+        }
+        if subject_ids is not None:
+            query["subjectId"] = {"$in": subject_ids}
+        return list(self.rollups.find(query, {"_id": 0}).sort("bucket", 1))
+
+    def group_trend(self, granularity, subject_ids=None):
+        """Class-wide (or per-subject) totals per bucket, summed by MongoDB."""
+        match = {"granularity": granularity}
+        if subject_ids is not None:
+            match["subjectId"] = {"$in": subject_ids}
+        return list(
+            self.rollups.aggregate(
+                [
+                    {"$match": match},
+                    {
+                        "$group": {
+                            "_id": "$bucket",
+                            "Total_Score": {"$sum": "$Total_Score"},
+                            "MaxTotal": {"$sum": "$MaxTotal"},
+                            "results": {"$sum": "$results"},
+                            "students": {"$addToSet": "$studentId"},
+                        }
+                    },
+                    {
+                        "$project": {
+                            "_id": 0,
+                            "bucket": "$_id",
+                            "Total_Score": 1,
+                            "MaxTotal": 1,
+                            "results": 1,
+                            "students": {"$size": "$students"},
+                        }
+                    },
+                    {"$sort": {"bucket": 1}},
+                ]
+            )
+        )
+
+
+trend_rollups = TrendRollups()
+
+
+def trend_point(doc):
+    max_total = doc.get("MaxTotal") or 0
+    point = {
+        "bucket": doc["bucket"].date().isoformat(),
+        "total": doc.get("Total_Score") or 0,
+        "max_total": max_total,
+        "percentage": (
+            round(doc["Total_Score"] / max_total * 100, 2) if max_total else None
+        ),
+        "results": doc.get("results", 0),
+    }
+    if "students" in doc:
+        point["students"] = doc["students"]
+    return point
 
 
-# --- Initialize Analyzer (best-effort on startup) ---
-try:
-    df_init, subjects_init = load_data_from_mongo()
-    analyzer = PerformanceAnalyzer(df_init, subjects=subjects_init)
-except Exception as e:
-    print("⚠️ Initial MongoDB data load failed:", e)
-    analyzer = PerformanceAnalyzer(pd.DataFrame(), subjects=[])
+def resolve_subject_ids(subject):
+    """(subject ids, display name) for a subject id or name; 404 if unknown."""
+    docs = list(
+        db[SUBJECTS_COLLECTION].find(subject_lookup_query(subject), {"name": 1})
+    )
+    if not docs:
+        raise HTTPException(status_code=404, detail=f"Unknown subject: {subject}")
+    return [doc["_id"] for doc in docs], docs[0].get("name", subject)
+
+
+def student_trend_payload(student_id, granularity, subject):
+    require_mongo()
+    subject_ids, subject_name = (
+        resolve_subject_ids(subject) if subject else (None, None)
+    )
+    docs = trend_rollups.student_trend(student_id, granularity, subject_ids)
+    names = {
+        doc["_id"]: doc.get("name", "Unknown")
+        for doc in db[SUBJECTS_COLLECTION].find(
+            {"_id": {"$in": list({d.get("subjectId") for d in docs})}}, {"name": 1}
+        )
+    }
+    by_subject = defaultdict(list)
+    overall = {}
+    for doc in docs:
+        by_subject[names.get(doc.get("subjectId"), "Unknown")].append(trend_point(doc))
+        # all subjects summed per bucket
+        bucket = overall.setdefault(
+            doc["bucket"],
+            {"bucket": doc["bucket"], "Total_Score": 0, "MaxTotal": 0, "results": 0},
+        )
+        for field in ("Total_Score", "MaxTotal", "results"):
+            bucket[field] += doc.get(field) or 0
+    return {
+        "student_id": student_id,
+        "granularity": granularity,
+        "subject": subject_name,
+        "overall": [trend_point(overall[b]) for b in sorted(overall)],
+        "subjects": [
+            {"subject": name, "points": points}
+            for name, points in sorted(by_subject.items())
+        ],
+    }
+
+
+def group_trend_payload(granularity, subject=None):
+    require_mongo()
+    subject_ids, subject_name = (
+        resolve_subject_ids(subject) if subject else (None, None)
+    )
+    return {
+        "granularity": granularity,
+        "subject": subject_name,
+        "points": [
+            trend_point(doc)
+            for doc in trend_rollups.group_trend(granularity, subject_ids)
+        ],
+    }
+
+
+# --- Startup: serve immediately, connect and warm the snapshot in the background ---
+async def warm_up():
+    try:
+        restored = await run_blocking(snapshot_manager.restore)
+        if not snapshot_manager.is_builder:
+            # Readers follow the builder worker's store whether or not MongoDB connects
+            snapshot_manager.start()
+        await run_blocking(connect_mongo)
+        retry = MONGO_RETRY_SECONDS
+        while collection is None and retry > 0:
+            # A restored snapshot keeps being served in the meantime
+            await asyncio.sleep(retry)
+            retry = min(retry * 2, MONGO_RETRY_MAX_SECONDS)
+            await run_blocking(connect_mongo)
+        if collection is not None:
+            if restored is None:
+                await run_blocking(snapshot_manager.refresh)
+            elif snapshot_manager.is_builder:
+                # Catch up on results written while the process was down
+                await run_blocking(change_feed.reset, restored.high_water)
+                await run_blocking(snapshot_manager.apply_updates)
+            snapshot_manager.start()
+    except Exception as e:
+        print("⚠️ Initial MongoDB data load failed:", e)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    warm_up_task = asyncio.create_task(warm_up())
+    yield
+    warm_up_task.cancel()
+    snapshot_manager.stop()
 
 
 # --- FastAPI App ---
-app = FastAPI(title="📊 FastAPI Student Dashboard")
+app = FastAPI(title="📊 FastAPI Student Dashboard", lifespan=lifespan)
+
+# Bounded pool for the blocking parts of requests. Snapshot builds run on the
+# SnapshotManager's own thread, so a slow refresh never occupies these workers.
+blocking_executor = ThreadPoolExecutor(
+    max_workers=BLOCKING_POOL_SIZE, thread_name_prefix="blocking"
+)
 
 
-# --- HTML templates (unchanged structure, using Template strings) ---
+async def run_blocking(fn, *args, **kwargs):
+    """Run a blocking call in blocking_executor without stalling the event loop."""
+    loop = asyncio.get_running_loop()
+    # Carry request_timings (and other context) into the worker thread
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        blocking_executor, functools.partial(context.run, fn, *args, **kwargs)
+    )
+
+
+@app.middleware("http")
+async def server_timing(request: Request, call_next):
+    timings = []
+    token = request_timings.set(timings)
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        request_timings.reset(token)
+    elapsed = time.perf_counter() - started
+
+    route = request.scope.get("route")
+    path = getattr(route, "path", "unmatched")
+    metrics.observe(
+        "dashboard_request_seconds", elapsed, route=path, method=request.method
+    )
+    metrics.inc(
+        "dashboard_requests_total",
+        route=path,
+        method=request.method,
+        status=response.status_code,
+    )
+
+    # Streaming bodies are produced after this point; their stages aren't included
+    totals = {}
+    for stage, seconds in timings:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    entries = [f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in totals.items()]
+    entries.append(f"total;dur={elapsed * 1000:.2f}")
+    response.headers["Server-Timing"] = ", ".join(entries)
+    return response
+
+
+# --- HTML templates (unchanged structure, compiled once below) ---
 HOME_HTML = """<!DOCTYPE html>
 <html lang="en">
 <head>
@@ -505,6 +2923,7 @@ HOME_HTML = """<!DOCTYPE html>
   <title>Class Performance Dashboard</title>
   <script src="https://cdn.tailwindcss.com"></script>
   <script src="https://code.jquery.com/jquery-3.7.0.min.js"></script>
+  <script src="{{ plotly_js_url }}"></script>
   <style>
     /* Loader animation */
     .loader {
@@ -577,11 +2996,7 @@ HOME_HTML = """<!DOCTYPE html>
   </div>
 
   <!-- Charts (stacked vertically) -->
-  <div id="charts" class="space-y-6 mb-10 text-center">
-    {{ score_dist|safe }}
-    {{ perf_dist|safe }}
-    {{ risk_dist|safe }}
-  </div>
+  <div id="charts" class="space-y-6 mb-10 text-center"></div>
 
   <!-- Table -->
   <div class="overflow-x-auto bg-slate-900 border border-slate-800 rounded-xl shadow-lg">
@@ -603,7 +3018,7 @@ HOME_HTML = """<!DOCTYPE html>
           <td class="px-4 py-3 text-slate-200">{{s.Rank}}</td>
           <td class="px-4 py-3 text-slate-200">{{s.Status}}</td>
           <td class="px-4 py-3">
-            <a href="/report/{{s.StudentID}}" class="text-blue-400 hover:text-blue-300 underline">View Report</a>
+            <a href="/report/{{s.StudentID}}{{ report_suffix }}" class="text-blue-400 hover:text-blue-300 underline">View Report</a>
           </td>
         </tr>
         {% endfor %}
@@ -611,6 +3026,15 @@ HOME_HTML = """<!DOCTYPE html>
     </table>
   </div>
 
+  <!-- Pager -->
+  <div class="flex items-center justify-between mt-4 text-sm text-slate-300">
+    <span id="pageInfo"></span>
+    <div class="flex gap-2">
+      <button id="prevPage" class="bg-slate-800 hover:bg-slate-700 px-3 py-1 rounded-lg disabled:opacity-40">Prev</button>
+      <button id="nextPage" class="bg-slate-800 hover:bg-slate-700 px-3 py-1 rounded-lg disabled:opacity-40">Next</button>
+    </div>
+  </div>
+
   <script>
     function showLoader(show) {
       if (show) {
@@ -620,7 +3044,32 @@ HOME_HTML = """<!DOCTYPE html>
       }
     }
 
-    function update_dashboard() {
+    function renderCharts(charts) {
+      const container = document.getElementById("charts");
+      container.innerHTML = "";
+      charts.forEach(function(fig) {
+        const div = document.createElement("div");
+        container.appendChild(div);
+        Plotly.newPlot(div, fig.data, fig.layout);
+      });
+    }
+
+    renderCharts({{ charts|safe }});
+
+    const pageSize = {{ page_size }};
+    const scopeParams = {{ scope_params|tojson }};
+    let currentOffset = 0;
+    let currentTotal = {{ total }};
+
+    function renderPager() {
+      const first = currentTotal === 0 ? 0 : currentOffset + 1;
+      const last = Math.min(currentOffset + pageSize, currentTotal);
+      $("#pageInfo").text("Showing " + first + "-" + last + " of " + currentTotal);
+      $("#prevPage").prop("disabled", currentOffset === 0);
+      $("#nextPage").prop("disabled", currentOffset + pageSize >= currentTotal);
+    }
+
+    function update_dashboard(offset) {
       showLoader(true);
       const perf = $("#performance").val();
       const risk = $("#risk").val();
@@ -628,9 +3077,13 @@ HOME_HTML = """<!DOCTYPE html>
       const subject = $("#subject").val();
       const below = $("#below").val();
 
-      $.get("/filter", { performance: perf, risk: risk, search: search, subject: subject, below: below }, function(data) {
+      const params = { performance: perf, risk: risk, search: search, subject: subject, below: below, offset: offset, limit: pageSize };
+      $.get("/filter", Object.assign(params, scopeParams), function(data) {
         $("#student_table").html(data.table_html);
-        $("#charts").html(data.charts_html);
+        renderCharts(data.charts);
+        currentOffset = data.offset;
+        currentTotal = data.total;
+        renderPager();
         showLoader(false);
       }).fail(function() {
         showLoader(false);
@@ -638,7 +3091,10 @@ HOME_HTML = """<!DOCTYPE html>
       });
     }
 
-    $("#applyFilters").click(update_dashboard);
+    renderPager();
+    $("#applyFilters").click(function() { update_dashboard(0); });
+    $("#prevPage").click(function() { update_dashboard(Math.max(currentOffset - pageSize, 0)); });
+    $("#nextPage").click(function() { update_dashboard(currentOffset + pageSize); });
 
     // Show loader on page navigation
     $(document).on("click", "a", function() {
@@ -655,6 +3111,7 @@ REPORT_HTML = """<!DOCTYPE html>
 <head>
 <title>{{ student.Name }} Report</title>
 <script src="https://cdn.tailwindcss.com"></script>
+<script src="{{ plotly_js_url }}"></script>
 </head>
 
 <body class="bg-slate-950 text-gray-100 p-6">
@@ -670,6 +3127,11 @@ REPORT_HTML = """<!DOCTYPE html>
     <p><span class="font-semibold">Risk Level:</span> {{ student["Risk Level"] }}</p>
 </div>
 
+<div class="mb-6">
+    <h3 class="font-semibold text-lg mb-2">Performance Summary:</h3>
+    <pre class="whitespace-pre-wrap text-gray-100 border border-gray-700 rounded-lg p-4 bg-slate-800">{{ summary }}</pre>
+</div>
+
 <div class="mb-6">
     <h3 class="font-semibold text-lg mb-2">Subject-wise Feedback:</h3>
     <div class="max-h-96 overflow-y-auto border border-gray-700 rounded-lg p-4 bg-slate-800">
@@ -682,13 +3144,15 @@ REPORT_HTML = """<!DOCTYPE html>
     </div>
 </div>
 
-<div class="grid grid-cols-1 md:grid-cols-1 gap-6 text-center">
-    {{ marks_chart|safe }}
-    {{ compare_chart|safe }}
-    {{ pie_chart|safe }}
-</div>
+<div id="charts" class="grid grid-cols-1 md:grid-cols-1 gap-6 text-center"></div>
 
 <script>
+{{ charts|safe }}.forEach(function(fig) {
+    const div = document.createElement('div');
+    document.getElementById('charts').appendChild(div);
+    Plotly.newPlot(div, fig.data, fig.layout);
+});
+
 // Simple toggle for feedback area
 document.getElementById('toggleFeedback').addEventListener('click', function() {
     const content = document.getElementById('feedbackContent');
@@ -700,15 +3164,283 @@ document.getElementById('toggleFeedback').addEventListener('click', function() {
 </html>
 """
 
+# Compiled once at import; autoescape covers names, subjects and feedback text
+template_env = Environment(autoescape=True)
+HOME_TEMPLATE = template_env.from_string(HOME_HTML)
+REPORT_TEMPLATE = template_env.from_string(REPORT_HTML)
+# Bytes buffered per chunk when streaming a template
+TEMPLATE_STREAM_CHUNK = 16 * 1024
+
+
+class PartialBody(str):
+    """A page rendered without some of its data: sent as is, never cached or tagged."""
+
+
+class LazyHTML:
+    """Trusted markup built only when the template reaches it, after earlier chunks are sent."""
+
+    def __init__(self, render):
+        self._render = render
+
+    def __html__(self):
+        return self._render()
+
+
+def stream_template(template, context, chunk_size=TEMPLATE_STREAM_CHUNK):
+    """Encode template.generate() output in chunks of roughly `chunk_size` bytes."""
+    started = time.perf_counter()
+    buffered, size = [], 0
+    for piece in template.generate(**context):
+        buffered.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            yield "".join(buffered).encode("utf-8")
+            buffered, size = [], 0
+    if buffered:
+        yield "".join(buffered).encode("utf-8")
+    record_stage("template", time.perf_counter() - started)
+
+
+# --- Static plotly.js, served once and cached by the browser ---
+PLOTLY_JS_URL = f"/static/plotly-{plotly.__version__}.min.js"
+_plotly_js = None
+
+
+def charts_array(charts):
+    return "[" + ",".join(charts) + "]"
+
 
 # --- Routes ---
+@app.get("/static/plotly-{version}.min.js")
+async def plotly_js(version: str):
+    global _plotly_js
+    if _plotly_js is None:
+        _plotly_js = await run_blocking(lambda: get_plotlyjs().encode("utf-8"))
+    # The URL carries the plotly version, so the asset never changes under it
+    return Response(
+        _plotly_js,
+        media_type="application/javascript",
+        headers={"Cache-Control": "public, max-age=31536000, immutable"},
+    )
+
+
+# --- Conditional GET: ETags from the snapshot, encoded bodies cached per snapshot ---
+def negotiate_encoding(accept_encoding):
+    """Best of br (if brotli is installed), gzip or identity for an Accept-Encoding header."""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.strip().lower()] = q
+    for encoding in ("br", "gzip"):
+        if encoding == "br" and brotli is None:
+            continue
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return "identity"
+
+
+class _Encoder:
+    """Incremental gzip/br encoder; every chunk is flushed so streamed pages aren't held back."""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == "gzip":
+            self._gzip = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        elif encoding == "br":
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def encode(self, data):
+        if self.encoding == "gzip":
+            return self._gzip.compress(data) + self._gzip.flush(zlib.Z_SYNC_FLUSH)
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.flush()
+        return data
+
+    def finish(self):
+        if self.encoding == "gzip":
+            return self._gzip.flush()
+        if self.encoding == "br":
+            return self._brotli.finish()
+        return b""
+
+
+def snapshot_tag(snapshot):
+    # Version plus build time, so workers with separately built snapshots never share tags
+    offline = "" if collection is not None else ".offline"
+    return f"{snapshot.version}.{int(snapshot.built_at * 1000)}{offline}"
+
+
+def response_etag(snapshot, request, encoding):
+    params = sorted(request.query_params.multi_items())
+    digest = hashlib.sha1(
+        json.dumps([request.url.path, params]).encode("utf-8")
+    ).hexdigest()[:16]
+    suffix = "" if encoding == "identity" else f"-{encoding}"
+    return f'"{snapshot_tag(snapshot)}-{digest}{suffix}"'
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    return "*" in candidates or any(
+        tag.removeprefix("W/") == etag for tag in candidates
+    )
+
+
+class ResponseCache:
+    """
+    Encoded response bodies by ETag. The full snapshot and each scoped one
+    keep their own bodies; a newer build of either drops only its own.
+    """
+
+    def __init__(self, max_bytes=RESPONSE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        # scope key (None for the full snapshot) -> tag of the snapshot cached for it
+        self._tags = {}
+        # etag -> (scope key, body)
+        self._bodies = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, snapshot, etag):
+        with self._lock:
+            body = None
+            if self._tags.get(snapshot.scope) == snapshot_tag(snapshot):
+                entry = self._bodies.get(etag)
+                if entry is not None:
+                    self._bodies.move_to_end(etag)
+                    body = entry[1]
+        metrics.inc(
+            "dashboard_cache_requests_total",
+            cache="responses",
+            result="hit" if body is not None else "miss",
+        )
+        return body
+
+    def _drop(self, etag):
+        _, body = self._bodies.pop(etag)
+        self._bytes -= len(body)
+
+    def put(self, snapshot, etag, body):
+        if len(body) > self.max_bytes:
+            return
+        tag = snapshot_tag(snapshot)
+        with self._lock:
+            if self._tags.get(snapshot.scope) != tag:
+                self._tags[snapshot.scope] = tag
+                for stale in [
+                    key
+                    for key, (scope, _) in self._bodies.items()
+                    if scope == snapshot.scope
+                ]:
+                    self._drop(stale)
+            if etag in self._bodies:
+                self._drop(etag)
+            self._bodies[etag] = (snapshot.scope, body)
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._bodies)))
+
+    def clear(self):
+        with self._lock:
+            self._tags.clear()
+            self._bodies.clear()
+            self._bytes = 0
+
+
+response_cache = ResponseCache()
+
+
+def _encode_and_cache(chunks, encoder, snapshot, etag):
+    parts = []
+    for chunk in chunks:
+        data = encoder.encode(
+            chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+        )
+        if data:
+            parts.append(data)
+            yield data
+    tail = encoder.finish()
+    if tail:
+        parts.append(tail)
+        yield tail
+    response_cache.put(snapshot, etag, b"".join(parts))
+
+
+async def conditional_response(request, media_type, render, scope=None):
+    """
+    Serve `render(analyzer)` for the current snapshot (or the one for `scope`)
+    with an ETag, answering 304 when the client already has it. Encoded bodies
+    are cached per snapshot. `render` runs in the blocking pool and returns a
+    str/bytes body or an iterator of chunks, which is streamed and cached once
+    complete.
+    """
+    snapshot = await run_blocking(get_snapshot, scope)
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    etag = response_etag(snapshot, request, encoding)
+    headers = {"ETag": etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    body = response_cache.get(snapshot, etag)
+    if body is not None:
+        return Response(body, media_type=media_type, headers=headers)
+
+    content = await run_blocking(render, snapshot.analyzer)
+    if isinstance(content, PartialBody):
+        # a later request must render again instead of revalidating this one
+        del headers["ETag"]
+        headers["Cache-Control"] = "no-store"
+        encoder = _Encoder(encoding)
+        body = encoder.encode(content.encode("utf-8")) + encoder.finish()
+        return Response(body, media_type=media_type, headers=headers)
+    encoded = _encode_and_cache(
+        [content] if isinstance(content, (str, bytes)) else content,
+        _Encoder(encoding),
+        snapshot,
+        etag,
+    )
+    if isinstance(content, (str, bytes)):
+        body = await run_blocking(b"".join, encoded)
+        return Response(body, media_type=media_type, headers=headers)
+    return StreamingResponse(encoded, media_type=media_type, headers=headers)
+
+
 @app.get("/", response_class=HTMLResponse)
-async def home(request: Request):
-    analyzer = get_latest_analyzer()
-    # Convert DataFrame rows to list of dicts for template
-    students = analyzer.df.to_dict("records") if not analyzer.df.empty else []
-    html = Template(HOME_HTML).render(
+async def home(
+    request: Request, scope: Optional[AnalysisScope] = Depends(scope_params)
+):
+    # Head, filters and the first table page go out before the charts are built
+    return await conditional_response(
+        request,
+        "text/html; charset=utf-8",
+        lambda analyzer: stream_template(HOME_TEMPLATE, home_context(analyzer, scope)),
+        scope=scope,
+    )
+
+
+def home_context(analyzer, scope=None):
+    # Only the first page of the table is rendered; the pager fetches the rest via /filter
+    total, _, page = student_page(analyzer, {}, "Rank", "asc", 0, TABLE_PAGE_SIZE)
+    students = analyzer.rows(
+        page, ["StudentID", "Name", "Percentage", "Rank", "Status"]
+    )
+    return dict(
         students=students,
+        total=total,
+        page_size=TABLE_PAGE_SIZE,
         levels=(
             sorted(
                 analyzer.df["Performance Level"].dropna().astype(str).unique().tolist()
@@ -722,120 +3454,174 @@ async def home(request: Request):
             else []
         ),
         subjects=analyzer.subjects,
-        score_dist=analyzer.plot_score_distribution(),
-        perf_dist=analyzer.plot_performance_distribution(),
-        risk_dist=analyzer.plot_risk_distribution(),
+        charts=LazyHTML(lambda: charts_array(analyzer.dashboard_charts())),
+        plotly_js_url=PLOTLY_JS_URL,
+        # carried into /filter calls and report links so they stay in scope
+        scope_params=scope.params() if scope else {},
+        report_suffix=scope.query_suffix() if scope else "",
+    )
+
+
+def parse_below(below):
+    # Convert below to int if possible, else None
+    try:
+        return int(below) if below and below.strip() != "" else None
+    except ValueError:
+        return None
+
+
+def student_page(analyzer, filters, sort, order, offset, limit):
+    """Filter, sort and slice the student table; returns (total, positions, page positions)."""
+    positions = analyzer.filter_positions(**filters)
+    try:
+        ordered = analyzer.sort_positions(
+            positions, sort=sort, descending=(order == "desc")
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return len(positions), positions, ordered[offset : offset + limit]
+
+
+def render_table_rows(rows, report_suffix=""):
+    cells = []
+    for s in rows:
+        sid = escape(str(s["StudentID"]))
+        cells.append(
+            '<tr class="hover:bg-slate-800 transition-all">'
+            f'<td class="px-4 py-3 text-slate-200">{escape(str(s["Name"]))}</td>'
+            f'<td class="px-4 py-3 text-slate-200">{s["Percentage"]:.2f}</td>'
+            f'<td class="px-4 py-3 text-slate-200">{s["Rank"]}</td>'
+            f'<td class="px-4 py-3 text-slate-200">{escape(str(s["Status"]))}</td>'
+            f'<td class="px-4 py-3"><a href="/report/{sid}{escape(report_suffix)}" class="text-blue-400 hover:text-blue-300 underline">View Report</a></td>'
+            "</tr>"
+        )
+    return "".join(cells)
+
+
+@app.get("/api/students", response_class=JSONResponse)
+async def list_students(
+    performance: Optional[str] = Query(None),
+    risk: Optional[str] = Query(None),
+    search: Optional[str] = Query(None),
+    subject: Optional[str] = Query(None),
+    below: Optional[str] = Query(None),
+    sort: str = Query("Rank"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(TABLE_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    scope: Optional[AnalysisScope] = Depends(scope_params),
+):
+    filters = dict(
+        performance=performance,
+        risk=risk,
+        search=search,
+        subject=subject,
+        below=parse_below(below),
+    )
+    payload = await run_blocking(
+        students_payload, filters, sort, order, offset, limit, scope
     )
-    return HTMLResponse(html)
+    return JSONResponse(payload)
+
+
+def students_payload(filters, sort, order, offset, limit, scope=None):
+    analyzer = get_snapshot(scope).analyzer
+    total, _, page = student_page(analyzer, filters, sort, order, offset, limit)
+    return {
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "sort": sort,
+        "order": order,
+        "rows": analyzer.rows(page),
+    }
 
 
 @app.get("/filter", response_class=JSONResponse)
 async def filter_data(
+    request: Request,
     performance: Optional[str] = Query(None),
     risk: Optional[str] = Query(None),
     search: Optional[str] = Query(None),
     subject: Optional[str] = Query(None),
     below: Optional[str] = Query(None),  # <-- keep as str
+    sort: str = Query("Rank"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(TABLE_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    scope: Optional[AnalysisScope] = Depends(scope_params),
 ):
-    analyzer = get_latest_analyzer()
-    df_filtered = analyzer.df.copy()
-
-    # Convert below to int if possible, else None
-    try:
-        below_value = int(below) if below and below.strip() != "" else None
-    except ValueError:
-        below_value = None
-
-    # Subject filtering
-    if subject:
-        if subject in df_filtered.columns:
-            df_filtered = df_filtered[df_filtered[subject] > 0]
-        else:
-            df_filtered = df_filtered.iloc[0:0]  # empty
-
-    if performance:
-        df_filtered = df_filtered[df_filtered["Performance Level"] == performance]
-    if risk:
-        df_filtered = df_filtered[df_filtered["Risk Level"] == risk]
-    if search:
-        df_filtered = df_filtered[
-            df_filtered["Name"].str.contains(search, case=False, na=False)
-            | (df_filtered["StudentID"].astype(str) == search)
-        ]
-    if subject and below_value is not None and (subject in df_filtered.columns):
-        df_filtered = df_filtered[df_filtered[subject] < below_value]
+    filters = dict(
+        performance=performance,
+        risk=risk,
+        search=search,
+        subject=subject,
+        below=parse_below(below),
+    )
+    return await conditional_response(
+        request,
+        "application/json",
+        lambda analyzer: filter_body(
+            analyzer, filters, sort, order, offset, limit, scope
+        ),
+        scope=scope,
+    )
 
-    table_html = ""
-    for _, s in df_filtered.iterrows():
-        table_html += f"<tr><td>{s.StudentID}</td><td>{s.Name}</td><td>{s.Percentage:.2f}</td><td>{s.Rank}</td><td>{s.Status}</td><td><a href='/report/{s.StudentID}'>View Report</a></td></tr>"
 
-    charts_html = (
-        analyzer.plot_score_distribution(df_filtered)
-        + analyzer.plot_performance_distribution(df_filtered)
-        + analyzer.plot_risk_distribution(df_filtered)
+def filter_body(analyzer, filters, sort, order, offset, limit, scope=None):
+    total, positions, page = student_page(analyzer, filters, sort, order, offset, limit)
+    table_html = render_table_rows(
+        analyzer.rows(page, ["StudentID", "Name", "Percentage", "Rank", "Status"]),
+        report_suffix=scope.query_suffix() if scope else "",
     )
 
-    return JSONResponse({"table_html": table_html, "charts_html": charts_html})
+    # charts cover every matching student, not just the page
+    # figure JSON is already serialized; splice it in rather than re-encoding
+    charts = charts_array(analyzer.dashboard_charts(positions))
+    body = (
+        '{"table_html": %s, "charts": %s, "total": %d, "offset": %d, "limit": %d}'
+        % (
+            json.dumps(table_html),
+            charts,
+            total,
+            offset,
+            limit,
+        )
+    )
+    return body
 
 
 @app.get("/report/{student_id}", response_class=HTMLResponse)
-async def report(student_id: str):
-    analyzer = get_latest_analyzer()
+async def report(
+    request: Request,
+    student_id: str,
+    scope: Optional[AnalysisScope] = Depends(scope_params),
+):
+    # In a scope, ranks and class averages are those of the scoped results
+    return await conditional_response(
+        request,
+        "text/html; charset=utf-8",
+        lambda analyzer: render_report(analyzer, student_id),
+        scope=scope,
+    )
+
+
+def render_report(analyzer, student_id):
     student = analyzer.get_student_data(student_id)
     if student is None:
         raise HTTPException(status_code=404, detail="Student not found")
 
-    # Fetch detailed examresults for this student to show AI feedback and evaluationDetails
-    # We'll join subject and exam again to make the feedback readable
+    # Detailed examresults (feedback, evaluationDetails) are loaded on demand
+    if collection is None:
+        return report_html(analyzer, student, [])
     try:
-        pipeline = [
-            (
-                {"$match": {"studentId": {"$in": [student_id, {"$oid": student_id}]}}}
-                if False
-                else {"$match": {"studentId": {"$eq": None}}}
-            )
-        ]
-        # Simpler approach: use a fresh aggregation with stringified studentId
-        pipeline = [
-            {"$addFields": {"studentIdStr": {"$toString": "$studentId"}}},
-            {"$match": {"studentIdStr": student_id}},
-            {
-                "$lookup": {
-                    "from": EXAMS_COLLECTION,
-                    "localField": "examId",
-                    "foreignField": "_id",
-                    "as": "exam",
-                }
-            },
-            {"$unwind": {"path": "$exam", "preserveNullAndEmptyArrays": True}},
-            {
-                "$lookup": {
-                    "from": SUBJECTS_COLLECTION,
-                    "localField": "exam.subject",
-                    "foreignField": "_id",
-                    "as": "subject",
-                }
-            },
-            {"$unwind": {"path": "$subject", "preserveNullAndEmptyArrays": True}},
-            {
-                "$project": {
-                    "_id": {"$toString": "$_id"},
-                    "examTitle": "$exam.title",
-                    "subjectName": "$subject.name",
-                    "totalMarksObtained": {"$ifNull": ["$totalMarksObtained", 0]},
-                    "totalMaxMarks": {"$ifNull": ["$totalMaxMarks", 0]},
-                    "percentage": {"$ifNull": ["$percentage", 0]},
-                    "feedback": {"$ifNull": ["$feedback", ""]},
-                    "evaluationDetails": {"$ifNull": ["$evaluationDetails", []]},
-                    "createdAt": 1,
-                }
-            },
-        ]
-        records = list(collection.aggregate(pipeline))
-    except Exception as e:
-        print("Error fetching detailed records for report:", e)
-        records = []
+        records = student_details_cache.get(student_id, fetch_student_details)
+    except StudentDetailsUnavailable:
+        return PartialBody(report_html(analyzer, student, []))
+    return report_html(analyzer, student, records)
 
+
+def report_html(analyzer, student, records):
     # Build feedback string concatenating feedbacks per record
     feedback_texts = []
     for rec in records:
@@ -843,27 +3629,566 @@ async def report(student_id: str):
         fb = rec.get("feedback", "")
         feedback_texts.append(f"{subj}:\n{fb}")
 
-    feedback = (
-        "\n\n".join(feedback_texts)
-        if feedback_texts
-        else (student.get("Feedback", "") if isinstance(student, dict) else "")
+    feedback = "\n\n".join(feedback_texts)
+
+    charts = charts_array(analyzer.student_charts(student))
+    with stage_timer("template"):
+        html = REPORT_TEMPLATE.render(
+            student=student,
+            summary=analyzer.generate_ai_feedback(student),
+            feedback=feedback,
+            charts=charts,
+            plotly_js_url=PLOTLY_JS_URL,
+        )
+    return html
+
+
+# --- Leaderboard: top/bottom K, percentiles and neighbours from per-snapshot orderings ---
+def leaderboard_subject(analyzer, subject):
+    if subject and subject not in analyzer.subjects:
+        raise HTTPException(status_code=404, detail=f"Unknown subject: {subject}")
+    return subject or None
+
+
+def leaderboard_rows(analyzer, positions, first_place, subject):
+    """Board entries for `positions`, which sit at consecutive places from `first_place`."""
+    if len(positions) == 0:
+        return []
+    board = analyzer.leaderboard
+    scores = analyzer.df[subject or "Percentage"].to_numpy(dtype=float)[positions]
+    rows = analyzer.rows(positions, ["StudentID", "Name"])
+    for offset, (row, score, rank) in enumerate(
+        zip(rows, scores.tolist(), board.ranks(scores, subject).tolist())
+    ):
+        row.update(place=first_place + offset + 1, rank=rank, score=score)
+    return rows
+
+
+def leaderboard_payload(scope, subject, end, k):
+    analyzer = get_snapshot(scope).analyzer
+    if analyzer.df.empty:
+        return {"subject": subject, "end": end, "total": 0, "rows": []}
+    subject = leaderboard_subject(analyzer, subject)
+    board = analyzer.leaderboard
+    total = board.size(subject)
+    if end == "top":
+        rows = leaderboard_rows(analyzer, board.top(k, subject), 0, subject)
+    else:
+        # worst first
+        first = max(total - k, 0)
+        rows = leaderboard_rows(
+            analyzer, board.window(first, total - 1, subject), first, subject
+        )[::-1]
+    return {"subject": subject, "end": end, "total": total, "rows": rows}
+
+
+def leaderboard_around_payload(scope, subject, student_id, rank, radius):
+    analyzer = get_snapshot(scope).analyzer
+    subject = leaderboard_subject(analyzer, subject) if not analyzer.df.empty else None
+    board = analyzer.leaderboard
+    total = board.size(subject) if not analyzer.df.empty else 0
+    if student_id is not None:
+        position = analyzer.student_position(student_id)
+        place = board.place_of(position, subject) if position is not None else None
+        if place is None:
+            raise HTTPException(status_code=404, detail="Student not on leaderboard")
+    elif rank is not None and 1 <= rank <= total:
+        place = rank - 1
+    else:
+        raise HTTPException(
+            status_code=400, detail=f"Give student_id or a rank between 1 and {total}"
+        )
+    first = max(place - radius, 0)
+    return {
+        "subject": subject,
+        "total": total,
+        "place": place + 1,
+        "rows": leaderboard_rows(
+            analyzer, board.window(first, place + radius, subject), first, subject
+        ),
+    }
+
+
+def percentile_payload(scope, subject, student_id):
+    analyzer = get_snapshot(scope).analyzer
+    student = analyzer.get_student_data(student_id)
+    if student is None:
+        raise HTTPException(status_code=404, detail="Student not found")
+    subject = leaderboard_subject(analyzer, subject)
+    board = analyzer.leaderboard
+    place = board.place_of(analyzer.student_position(student_id), subject)
+    if place is None:
+        raise HTTPException(status_code=404, detail="Student not on leaderboard")
+    score = float(student[subject or "Percentage"])
+    return {
+        "StudentID": str(student["StudentID"]),
+        "Name": str(student["Name"]),
+        "subject": subject,
+        "score": score,
+        "place": place + 1,
+        "rank": int(board.ranks([score], subject)[0]),
+        "percentile": round(board.percentile(score, subject), 2),
+        "total": board.size(subject),
+    }
+
+
+@app.get("/api/leaderboard", response_class=JSONResponse)
+async def leaderboard(
+    subject: Optional[str] = Query(None),
+    end: str = Query("top", pattern="^(top|bottom)$"),
+    k: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    scope: Optional[AnalysisScope] = Depends(scope_params),
+):
+    payload = await run_blocking(leaderboard_payload, scope, subject, end, k)
+    return JSONResponse(payload)
+
+
+@app.get("/api/leaderboard/around", response_class=JSONResponse)
+async def leaderboard_around(
+    student_id: Optional[str] = Query(None),
+    rank: Optional[int] = Query(None),
+    radius: int = Query(5, ge=0, le=MAX_PAGE_SIZE // 2),
+    subject: Optional[str] = Query(None),
+    scope: Optional[AnalysisScope] = Depends(scope_params),
+):
+    payload = await run_blocking(
+        leaderboard_around_payload, scope, subject, student_id, rank, radius
+    )
+    return JSONResponse(payload)
+
+
+@app.get("/api/leaderboard/percentile/{student_id}", response_class=JSONResponse)
+async def leaderboard_percentile(
+    student_id: str,
+    subject: Optional[str] = Query(None),
+    scope: Optional[AnalysisScope] = Depends(scope_params),
+):
+    payload = await run_blocking(percentile_payload, scope, subject, student_id)
+    return JSONResponse(payload)
+
+
+# --- Trends: read from the rollups, never from raw examresults ---
+@app.get("/api/trends/class", response_class=JSONResponse)
+async def class_trend(granularity: str = Query("month", pattern="^(week|month|term)$")):
+    return JSONResponse(await run_blocking(group_trend_payload, granularity))
+
+
+@app.get("/api/trends/subject/{subject}", response_class=JSONResponse)
+async def subject_trend(
+    subject: str,
+    granularity: str = Query("month", pattern="^(week|month|term)$"),
+):
+    return JSONResponse(await run_blocking(group_trend_payload, granularity, subject))
+
+
+@app.get("/api/trends/student/{student_id}", response_class=JSONResponse)
+async def student_trend(
+    student_id: str,
+    granularity: str = Query("month", pattern="^(week|month|term)$"),
+    subject: Optional[str] = Query(None),
+):
+    payload = await run_blocking(
+        student_trend_payload, student_id, granularity, subject
+    )
+    return JSONResponse(payload)
+
+
+# --- Bulk class reports: one snapshot, one details query, rendered in a process pool ---
+_report_worker_analyzer = None
+
+# Workers come from a forkserver (spawn where there is none), never from forking
+# this process, whose other threads may hold locks such as the metrics lock
+_report_pool_context = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+if _report_pool_context.get_start_method() == "forkserver" and __name__ != "__main__":
+    # imported once by the server, so each worker starts without re-importing
+    _report_pool_context.set_forkserver_preload([__name__])
+_report_pool_slots = threading.BoundedSemaphore(max(BULK_REPORT_CONCURRENCY, 1))
+
+
+def _init_report_worker(df, subjects):
+    # Runs once per worker process; every chunk it renders reuses this analyzer
+    global _report_worker_analyzer
+    _report_worker_analyzer = PerformanceAnalyzer(
+        df, subjects=subjects, preprocess=False
+    )
+
+
+def _render_report_chunk(chunk):
+    return render_report_chunk(_report_worker_analyzer, chunk)
+
+
+def render_report_chunk(analyzer, chunk):
+    """Render [(student_id, records), ...]; returns [(student, html), ...]."""
+    rendered = []
+    for student_id, records in chunk:
+        student = analyzer.get_student_data(student_id)
+        if student is not None:
+            rendered.append((student, report_html(analyzer, student, records)))
+    return rendered
+
+
+def fetch_details_for_students(student_ids):
+    """All detail records for `student_ids` in one aggregation, grouped by studentId."""
+    details = defaultdict(list)
+    if collection is None or not student_ids:
+        return details
+    with stage_timer("mongo_details"):
+        cursor = collection.aggregate(
+            student_details_pipeline(student_ids), batchSize=INGEST_BATCH_SIZE
+        )
+        for rec in cursor:
+            details[rec.get("studentId")].append(rec)
+    return details
+
+
+def iter_bulk_reports(analyzer, student_ids, details, workers=None):
+    """
+    Yield (student, html) for `student_ids` in completion order, rendered by
+    `workers` processes (BULK_REPORT_WORKERS unless given).
+    """
+    if workers is None:
+        workers = BULK_REPORT_WORKERS
+    size = max(BULK_REPORT_CHUNK_SIZE, 1)
+    chunks = (
+        [(sid, details.get(sid, [])) for sid in student_ids[i : i + size]]
+        for i in range(0, len(student_ids), size)
+    )
+    if workers <= 0:
+        # every student is rendered here, so build all feedback text in one batch
+        analyzer.feedback_texts()
+        for chunk in chunks:
+            yield from render_report_chunk(analyzer, chunk)
+        return
+
+    # At most BULK_REPORT_CONCURRENCY pools, each with at most `workers` processes
+    with _report_pool_slots:
+        # The frame is pickled once per process via the initializer, not per task
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=_report_pool_context,
+            initializer=_init_report_worker,
+            initargs=(analyzer.df, analyzer.subjects),
+        ) as pool:
+            # Keep a bounded number of chunks in flight so a slow reader applies backpressure
+            pending = {
+                pool.submit(_render_report_chunk, chunk)
+                for chunk in itertools.islice(chunks, workers * 2)
+            }
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
+                    for chunk in itertools.islice(chunks, 1):
+                        pending.add(pool.submit(_render_report_chunk, chunk))
+
+
+class _ByteSink:
+    """Write-only file object for zipfile/pyarrow; buffered bytes are handed out by drain()."""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def report_file_name(student):
+    return f"{student['StudentID']}.html"
+
+
+def stream_bulk_reports(analyzer, student_ids, details, fmt):
+    """Bytes of a ZIP archive (one HTML file per student) or NDJSON, as reports finish."""
+    reports = iter_bulk_reports(analyzer, student_ids, details)
+    if fmt == "ndjson":
+        for student, html in reports:
+            line = {
+                "student_id": str(student["StudentID"]),
+                "name": str(student["Name"]),
+                "html": html,
+            }
+            yield (json.dumps(line) + "\n").encode("utf-8")
+        return
+
+    sink = _ByteSink()
+    # The sink can't seek, so zipfile writes data descriptors after each member
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for student, html in reports:
+            archive.writestr(report_file_name(student), html)
+            yield sink.drain()
+    yield sink.drain()
+
+
+def bulk_report_plan(filters, scope=None):
+    """Snapshot, matching student ids (by rank) and their details for a bulk run."""
+    analyzer = get_snapshot(scope).analyzer
+    if analyzer.df.empty:
+        return analyzer, [], {}
+    positions = analyzer.sort_positions(analyzer.filter_positions(**filters), "Rank")
+    student_ids = [str(sid) for sid in analyzer.df["StudentID"].to_numpy()[positions]]
+    return analyzer, student_ids, fetch_details_for_students(student_ids)
+
+
+@app.get("/reports/bulk")
+async def bulk_reports(
+    performance: Optional[str] = Query(None),
+    risk: Optional[str] = Query(None),
+    search: Optional[str] = Query(None),
+    subject: Optional[str] = Query(None),
+    below: Optional[str] = Query(None),
+    format: str = Query("zip", pattern="^(zip|ndjson)$"),
+    scope: Optional[AnalysisScope] = Depends(scope_params),
+):
+    filters = dict(
+        performance=performance,
+        risk=risk,
+        search=search,
+        subject=subject,
+        below=parse_below(below),
+    )
+    analyzer, student_ids, details = await run_blocking(
+        bulk_report_plan, filters, scope
+    )
+    if format == "ndjson":
+        media_type, file_name = "application/x-ndjson", "class-reports.ndjson"
+    else:
+        media_type, file_name = "application/zip", "class-reports.zip"
+    return StreamingResponse(
+        stream_bulk_reports(analyzer, student_ids, details, format),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{file_name}"',
+            "X-Report-Count": str(len(student_ids)),
+        },
+    )
+
+
+def bulk_reports_cli(argv):
+    """python main.py bulk-reports [filters] --format zip|ndjson --output FILE"""
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="main.py bulk-reports")
+    for name in ("performance", "risk", "search", "subject", "below"):
+        parser.add_argument(f"--{name}")
+    # scope, as on the routes
+    for name in ("examId", "subjectId", "department", "from", "to"):
+        parser.add_argument(f"--{name}", dest=f"scope_{name}")
+    parser.add_argument("--format", choices=["zip", "ndjson"], default="zip")
+    parser.add_argument("--output", required=True)
+    args = parser.parse_args(argv)
+
+    connect_mongo()
+    if collection is None:
+        raise SystemExit("Database connection failed.")
+    filters = dict(
+        performance=args.performance,
+        risk=args.risk,
+        search=args.search,
+        subject=args.subject,
+        below=parse_below(args.below),
+    )
+    try:
+        scope = parse_scope(
+            args.scope_examId,
+            args.scope_subjectId,
+            args.scope_department,
+            args.scope_from,
+            args.scope_to,
+        )
+    except HTTPException as e:
+        raise SystemExit(e.detail)
+    analyzer, student_ids, details = bulk_report_plan(filters, scope)
+    # Written under a temporary name, so a failed run leaves no partial archive
+    partial = f"{args.output}.part"
+    try:
+        with open(partial, "wb") as out:
+            for data in stream_bulk_reports(
+                analyzer, student_ids, details, args.format
+            ):
+                out.write(data)
+        os.replace(partial, args.output)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    print(f"Wrote {len(student_ids)} reports to {args.output}")
+
+
+# --- Streaming export of the analyzed table ---
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "students.csv"),
+    "ndjson": ("application/x-ndjson", "students.ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "students.parquet"),
+}
+
+
+def export_plan(filters, sort, order, scope=None):
+    """Snapshot and the ordered row positions an export will stream."""
+    analyzer = get_snapshot(scope).analyzer
+    _, _, ordered = student_page(analyzer, filters, sort, order, 0, len(analyzer.df))
+    return analyzer, ordered
+
+
+def stream_export(
+    analyzer, positions, fmt, chunk_rows=EXPORT_CHUNK_ROWS, feedback=False
+):
+    """Encode the selected rows `chunk_rows` at a time; only one chunk is held in memory."""
+    columns = analyzer.table_columns() if not analyzer.df.empty else []
+    frame = analyzer.df[columns]
+    if feedback and not analyzer.df.empty:
+        # generated once per snapshot; the export only references it
+        frame = frame.assign(Feedback=analyzer.feedback_texts())
+    chunk_rows = max(chunk_rows, 1)
+    chunks = (
+        frame.iloc[positions[i : i + chunk_rows]]
+        for i in range(0, len(positions), chunk_rows)
+    )
+
+    if fmt == "csv":
+        yield frame.iloc[:0].to_csv(index=False).encode("utf-8")
+        for chunk in chunks:
+            yield chunk.to_csv(index=False, header=False).encode("utf-8")
+    elif fmt == "ndjson":
+        for chunk in chunks:
+            yield chunk.to_json(orient="records", lines=True).encode("utf-8")
+    else:
+        # Every chunk becomes a row group; the schema comes from the full frame
+        sink = _ByteSink()
+        schema = pa.Schema.from_pandas(frame.iloc[:0], preserve_index=False)
+        with pq.ParquetWriter(sink, schema) as writer:
+            for chunk in chunks:
+                writer.write_table(
+                    pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+                )
+                yield sink.drain()
+        yield sink.drain()
+
+
+@app.get("/export")
+async def export_students(
+    performance: Optional[str] = Query(None),
+    risk: Optional[str] = Query(None),
+    search: Optional[str] = Query(None),
+    subject: Optional[str] = Query(None),
+    below: Optional[str] = Query(None),
+    sort: str = Query("Rank"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    format: str = Query("csv", pattern="^(csv|ndjson|parquet)$"),
+    feedback: bool = Query(False),
+    scope: Optional[AnalysisScope] = Depends(scope_params),
+):
+    if format == "parquet" and pq is None:
+        raise HTTPException(
+            status_code=501, detail="Parquet export needs pyarrow installed."
+        )
+    filters = dict(
+        performance=performance,
+        risk=risk,
+        search=search,
+        subject=subject,
+        below=parse_below(below),
+    )
+    analyzer, positions = await run_blocking(export_plan, filters, sort, order, scope)
+    media_type, file_name = EXPORT_FORMATS[format]
+    return StreamingResponse(
+        stream_export(analyzer, positions, format, feedback=feedback),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{file_name}"',
+            "X-Row-Count": str(len(positions)),
+        },
     )
 
-    marks_chart = analyzer.plot_student_marks(student)
-    compare_chart = analyzer.plot_student_vs_class(student)
-    pie_chart = analyzer.plot_student_pie(student)
-    html = Template(REPORT_HTML).render(
-        student=student,
-        feedback=feedback,
-        marks_chart=marks_chart,
-        compare_chart=compare_chart,
-        pie_chart=pie_chart,
+
+@app.get("/healthz", response_class=JSONResponse)
+async def healthz():
+    # Liveness only: answers as soon as the process is up
+    return JSONResponse({"status": "ok"})
+
+
+@app.get("/ready", response_class=JSONResponse)
+async def ready():
+    snapshot = snapshot_manager.current
+    if snapshot is None:
+        return JSONResponse({"ready": False, "mongo": mongo_status}, status_code=503)
+    return JSONResponse(
+        {
+            "ready": True,
+            "mongo": mongo_status,
+            "version": snapshot.version,
+            "age_seconds": round(snapshot.age(), 3),
+            "rows": len(snapshot.analyzer.df),
+            "subjects": len(snapshot.analyzer.subjects),
+            "build_seconds": round(snapshot.build_seconds, 3),
+            "last_build_error": (
+                {
+                    "kind": snapshot_manager.last_error[0],
+                    "error": snapshot_manager.last_error[1],
+                    "age_seconds": round(
+                        time.time() - snapshot_manager.last_error[2], 3
+                    ),
+                }
+                if snapshot_manager.last_error
+                else None
+            ),
+            "scoped_snapshots": len(scoped_snapshots),
+            "ingest": last_ingest_stats,
+            "memory": snapshot.analyzer.memory_report(),
+        }
     )
-    return HTMLResponse(html)
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    metrics.set("dashboard_mongo_connected", int(mongo_status == "connected"))
+    snapshot = snapshot_manager.current
+    if snapshot is not None:
+        metrics.set("dashboard_snapshot_version", snapshot.version)
+        metrics.set("dashboard_snapshot_age_seconds", round(snapshot.age(), 3))
+        metrics.set("dashboard_snapshot_rows", len(snapshot.analyzer.df))
+        metrics.set("dashboard_snapshot_subjects", len(snapshot.analyzer.subjects))
+        metrics.set(
+            "dashboard_snapshot_frame_bytes",
+            snapshot.analyzer.memory_report()["frame_bytes"],
+        )
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.post("/snapshot/invalidate", response_class=JSONResponse)
+async def invalidate_snapshot():
+    snapshot = await run_blocking(get_latest_snapshot)
+    snapshot_manager.invalidate()
+    scoped_snapshots.clear()
+    return JSONResponse({"status": "scheduled", "version": snapshot.version})
 
 
 # --- Run Server ---
 if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:2] == ["bulk-reports"]:
+        bulk_reports_cli(sys.argv[2:])
+        sys.exit(0)
+
     import uvicorn
 
     print("Server running at http://127.0.0.1:8000")
@@ -0,0 +1,37 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    """An empty mongomock database wired in as main's db/collection."""
+    mongomock = pytest.importorskip("mongomock")
+    db = mongomock.MongoClient()[main.DB_NAME]
+    monkeypatch.setattr(main, "db", db)
+    monkeypatch.setattr(main, "collection", db[main.EXAMRESULTS_COLLECTION])
+    return db
+
+
+@pytest.fixture
+def serve(mongo, monkeypatch):
+    """Publish an analyzer as the current snapshot and return a client for the app."""
+    from fastapi.testclient import TestClient
+
+    main.response_cache.clear()
+
+    def publish(analyzer):
+        manager = main.SnapshotManager(
+            lambda: (analyzer, None), ttl=3600, poll_interval=0
+        )
+        monkeypatch.setattr(main, "snapshot_manager", manager)
+        manager.refresh()
+        return TestClient(main.app)
+
+    yield publish
+    main.snapshot_manager.stop()
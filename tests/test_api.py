@@ -0,0 +1,65 @@
+import asyncio
+import math
+
+import main
+from test_pivot import seed_collections
+
+
+def test_students_api_with_zero_max_marks(mongo, serve):
+    seed_collections(mongo, 0)
+    df, subjects = main.load_data_from_mongo()
+    zero_max = df.loc[(df["MaxTotal"] == 0) & (df["Total"] > 0), "StudentID"]
+    assert len(zero_max) == 1
+    client = serve(main.PerformanceAnalyzer(df, subjects=subjects))
+
+    response = client.get("/api/students", params={"limit": 200})
+    assert response.status_code == 200
+    payload = response.json()
+    rows = {row["StudentID"]: row for row in payload["rows"]}
+    assert len(rows) == payload["total"] == len(df)
+    assert all(math.isfinite(row["Percentage"]) for row in rows.values())
+    # no max marks scores 0, so the student shares the last rank
+    student = rows[zero_max.iloc[0]]
+    assert student["Percentage"] == 0
+    assert student["Rank"] == len(df)
+
+
+def test_snapshot_served_without_mongo(mongo, serve, monkeypatch):
+    seed_collections(mongo, 1)
+    client = serve(main.PerformanceAnalyzer(*main.load_data_from_mongo()))
+    monkeypatch.setattr(main, "collection", None)
+    monkeypatch.setattr(main, "mongo_status", "failed")
+    response = client.get("/api/students")
+    assert response.status_code == 200
+    assert response.json()["total"] > 0
+
+
+def test_restored_snapshot_served_until_mongo_connects(mongo, monkeypatch, tmp_path):
+    seed_collections(mongo, 0)
+    store = main.SnapshotStore(str(tmp_path))
+    published = main.SnapshotManager(main.build_analyzer, store=store).refresh()
+
+    manager = main.SnapshotManager(
+        main.build_analyzer, updater=main.update_analyzer, store=store
+    )
+    monkeypatch.setattr(main, "snapshot_manager", manager)
+    monkeypatch.setattr(main, "collection", None)
+    monkeypatch.setattr(main, "MONGO_RETRY_SECONDS", 0.01)
+    served = []
+
+    def connect_mongo():
+        # fails twice, then connects
+        served.append(main.get_latest_snapshot().version)
+        if len(served) == 3:
+            main.collection = mongo[main.EXAMRESULTS_COLLECTION]
+        else:
+            main.mongo_status = "failed"
+
+    monkeypatch.setattr(main, "connect_mongo", connect_mongo)
+    monkeypatch.setattr(main, "mongo_status", "pending")
+    try:
+        asyncio.run(main.warm_up())
+        assert served == [published.version] * 3
+        assert main.get_latest_snapshot().version == published.version
+    finally:
+        manager.stop()
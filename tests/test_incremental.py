@@ -0,0 +1,102 @@
+import datetime
+import time
+
+import pandas as pd
+from bson import ObjectId
+
+import main
+from test_pivot import seed_collections
+
+LATER = datetime.datetime(2026, 2, 1)
+
+
+def result(student_id, exam_id, obtained, max_marks):
+    return {
+        "examId": exam_id,
+        "studentId": student_id,
+        "totalMarksObtained": obtained,
+        "totalMaxMarks": max_marks,
+        "createdAt": LATER,
+        "updatedAt": LATER,
+    }
+
+
+def comparable(analyzer):
+    df = analyzer.df.sort_values(["StudentID", "Name"], kind="stable")
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype(object)
+    return df.reset_index(drop=True)
+
+
+def assert_update_matches_rebuild(db, change):
+    old, high_water = main.build_analyzer()
+    snapshot = main.AnalyzerSnapshot(old, 1, time.time(), 0, high_water=high_water)
+    change(db[main.EXAMRESULTS_COLLECTION])
+    analyzer, _ = main.update_analyzer(snapshot)
+    rebuilt, _ = main.build_analyzer()
+    pd.testing.assert_frame_equal(
+        comparable(analyzer), comparable(rebuilt), check_dtype=False, check_like=True
+    )
+    return analyzer
+
+
+def test_update_matches_rebuild(mongo):
+    seed_collections(mongo, 0)
+    exam = mongo[main.EXAMS_COLLECTION].find_one()["_id"]
+    student = mongo[main.USERS_COLLECTION].find_one({"firstName": "First3"})["_id"]
+    newcomer = ObjectId()
+    mongo[main.USERS_COLLECTION].insert_one(
+        {"_id": newcomer, "firstName": "New", "lastName": "Student"}
+    )
+    assert_update_matches_rebuild(
+        mongo, lambda results: results.insert_one(result(student, exam, 40, 50))
+    )
+    analyzer = assert_update_matches_rebuild(
+        mongo, lambda results: results.insert_one(result(newcomer, exam, 10, 0))
+    )
+    # no max marks in a frame that has them: 0%, not 10 of 100 per subject
+    assert analyzer.get_student_data(str(newcomer))["Percentage"] == 0
+
+
+def test_update_into_and_out_of_frame_without_max_marks(mongo):
+    exam = ObjectId()
+    students = [ObjectId() for _ in range(3)]
+    mongo[main.USERS_COLLECTION].insert_many(
+        [{"_id": sid, "firstName": "S", "lastName": str(sid)} for sid in students]
+    )
+    created = datetime.datetime(2026, 1, 1)
+    mongo[main.EXAMRESULTS_COLLECTION].insert_many(
+        [
+            dict(result(sid, exam, 20 + i, 0), createdAt=created, updatedAt=created)
+            for i, sid in enumerate(students)
+        ]
+    )
+    # the first max marks switch every row from the fallback to MaxTotal
+    assert_update_matches_rebuild(
+        mongo, lambda results: results.insert_one(result(students[0], exam, 30, 60))
+    )
+    # and losing them switches back
+    assert_update_matches_rebuild(
+        mongo,
+        lambda results: results.update_many(
+            {"totalMaxMarks": 60},
+            {
+                "$set": {
+                    "totalMaxMarks": 0,
+                    "updatedAt": LATER + datetime.timedelta(seconds=1),
+                }
+            },
+        ),
+    )
+
+
+def test_update_of_results_without_a_student(mongo):
+    seed_collections(mongo, 1)
+    exam = mongo[main.EXAMS_COLLECTION].find_one()["_id"]
+    orphan = result(ObjectId(), exam, 45, 50)
+    unassigned = result(None, exam, 5, 50)
+    del unassigned["studentId"]
+    # both join no user, so they land in the shared "Unknown Student" row
+    assert_update_matches_rebuild(mongo, lambda results: results.insert_one(orphan))
+    assert_update_matches_rebuild(mongo, lambda results: results.insert_one(unassigned))
@@ -0,0 +1,32 @@
+import math
+
+import main
+from test_pivot import seed_collections
+
+
+def test_leaderboard_with_zero_max_marks(mongo, serve):
+    seed_collections(mongo, 1)
+    df, subjects = main.load_data_from_mongo()
+    zero_max = df.loc[(df["MaxTotal"] == 0) & (df["Total"] > 0), "StudentID"]
+    assert len(zero_max) == 1
+    student_id = str(zero_max.iloc[0])
+    client = serve(main.PerformanceAnalyzer(df, subjects=subjects))
+
+    top = client.get("/api/leaderboard", params={"k": 3})
+    assert top.status_code == 200
+    assert student_id not in [row["StudentID"] for row in top.json()["rows"]]
+
+    bottom = client.get("/api/leaderboard", params={"end": "bottom", "k": 1})
+    assert bottom.status_code == 200
+    (last,) = bottom.json()["rows"]
+    assert last["score"] == 0 and last["rank"] > 1
+
+    around = client.get("/api/leaderboard/around", params={"student_id": student_id})
+    assert around.status_code == 200
+    assert all(math.isfinite(row["score"]) for row in around.json()["rows"])
+
+    percentile = client.get(f"/api/leaderboard/percentile/{student_id}")
+    assert percentile.status_code == 200
+    payload = percentile.json()
+    assert payload["score"] == 0
+    assert payload["rank"] == payload["total"]
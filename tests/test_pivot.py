@@ -0,0 +1,235 @@
+import datetime
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+from bson import ObjectId
+
+import main
+
+
+def reference_load(collection):
+    """
+    The original load_data_from_mongo: $lookup joins, per-row dicts and the
+    row-wise pivot. Feedback is left out; it is loaded per student on demand.
+    """
+    pipeline = [
+        {
+            "$lookup": {
+                "from": main.EXAMS_COLLECTION,
+                "localField": "examId",
+                "foreignField": "_id",
+                "as": "exam",
+            }
+        },
+        {"$unwind": {"path": "$exam", "preserveNullAndEmptyArrays": True}},
+        {
+            "$lookup": {
+                "from": main.SUBJECTS_COLLECTION,
+                "localField": "exam.subject",
+                "foreignField": "_id",
+                "as": "subject",
+            }
+        },
+        {"$unwind": {"path": "$subject", "preserveNullAndEmptyArrays": True}},
+        {
+            "$lookup": {
+                "from": main.USERS_COLLECTION,
+                "localField": "studentId",
+                "foreignField": "_id",
+                "as": "student",
+            }
+        },
+        {"$unwind": {"path": "$student", "preserveNullAndEmptyArrays": True}},
+        {
+            "$project": {
+                "_id": 0,
+                "studentId": {"$toString": "$student._id"},
+                "studentFirstName": "$student.firstName",
+                "studentLastName": "$student.lastName",
+                "Subject": "$subject.name",
+                "Total_Score": {"$ifNull": ["$totalMarksObtained", 0]},
+                "MaxTotal": {"$ifNull": ["$totalMaxMarks", 0]},
+            }
+        },
+    ]
+    rows = []
+    for d in collection.aggregate(pipeline):
+        full_name = (
+            (d.get("studentFirstName") or "") + " " + (d.get("studentLastName") or "")
+        ).strip()
+        rows.append(
+            {
+                "StudentID": d.get("studentId") or "",
+                "Name": full_name or "Unknown Student",
+                "Subject": d.get("Subject") or "Unknown",
+                "Total_Score": d.get("Total_Score") or 0,
+                "MaxTotal": d.get("MaxTotal") or 0,
+            }
+        )
+    if not rows:
+        return pd.DataFrame(), []
+    return reference_pivot(pd.DataFrame(rows))
+
+
+def reference_pivot(df_raw):
+    """The original pivot stage, row-wise apply and merges included."""
+    grouped = df_raw.groupby(["StudentID", "Name", "Subject"], as_index=False).agg(
+        {"Total_Score": "sum", "MaxTotal": "sum"}
+    )
+
+    def compute_pct(row):
+        if row["MaxTotal"] and row["MaxTotal"] > 0:
+            return (row["Total_Score"] / row["MaxTotal"]) * 100
+        return 0.0
+
+    grouped["Percentage"] = grouped.apply(compute_pct, axis=1)
+
+    subjects = sorted(grouped["Subject"].dropna().unique().tolist())
+    df_pivot = grouped.pivot_table(
+        index=["StudentID", "Name"],
+        columns="Subject",
+        values="Total_Score",
+        fill_value=0,
+    ).reset_index()
+    for s in subjects:
+        if s not in df_pivot.columns:
+            df_pivot[s] = 0
+
+    max_by_student = grouped.groupby(["StudentID", "Name"], as_index=False)[
+        "MaxTotal"
+    ].sum()
+    total_by_student = grouped.groupby(["StudentID", "Name"], as_index=False)[
+        "Total_Score"
+    ].sum()
+    df_pivot = df_pivot.merge(total_by_student, on=["StudentID", "Name"], how="left")
+    df_pivot = df_pivot.merge(
+        max_by_student, on=["StudentID", "Name"], how="left", suffixes=("", "_Max")
+    )
+    df_pivot.rename(columns={"Total_Score": "Total"}, inplace=True)
+    df_pivot["MaxTotal"] = pd.to_numeric(df_pivot["MaxTotal"], errors="coerce").fillna(
+        0
+    )
+    df_pivot["Total"] = pd.to_numeric(df_pivot["Total"], errors="coerce").fillna(0)
+    df_pivot["Percentage"] = np.where(
+        df_pivot["MaxTotal"] > 0, (df_pivot["Total"] / df_pivot["MaxTotal"]) * 100, 0.0
+    )
+    df_pivot["Status"] = df_pivot.apply(
+        lambda r: "Fail" if r.get("Percentage", 0) < 40 else "Pass", axis=1
+    )
+    df_pivot.columns.name = None
+    return df_pivot, subjects
+
+
+def assert_pivots_equal(actual, expected):
+    (df, subjects), (ref_df, ref_subjects) = actual, expected
+    assert subjects == ref_subjects
+    pd.testing.assert_frame_equal(
+        df.reset_index(drop=True),
+        ref_df[list(df.columns)].reset_index(drop=True),
+        check_dtype=False,
+        check_column_type=False,
+    )
+    assert list(df.columns) == list(ref_df.columns)
+
+
+def raw_records(seed, n_students=40, n_subjects=5, n_rows=400):
+    rnd = random.Random(seed)
+    subjects = [f"Subject {i}" for i in range(n_subjects)] + ["Unknown"]
+    students = [(f"{i:024x}", f"First{i} Last{i}") for i in range(n_students)]
+    students.append(("", "Unknown Student"))
+    rows = []
+    for _ in range(n_rows):
+        sid, name = rnd.choice(students)
+        rows.append(
+            {
+                "StudentID": sid,
+                "Name": name,
+                "Subject": rnd.choice(subjects),
+                "Total_Score": rnd.randint(0, 50),
+                # zero max marks on some rows, and on whole students/subjects
+                "MaxTotal": rnd.choice([0, 50, 50, 100]),
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_build_student_pivot_matches_reference(seed):
+    df_raw = raw_records(seed)
+    assert_pivots_equal(
+        main.build_student_pivot(df_raw), reference_pivot(df_raw.copy())
+    )
+
+
+def test_build_student_pivot_all_zero_max_marks():
+    df_raw = raw_records(3)
+    df_raw["MaxTotal"] = 0
+    df, subjects = main.build_student_pivot(df_raw)
+    assert (df["Percentage"] == 0).all() and (df["Status"] == "Fail").all()
+    assert_pivots_equal((df, subjects), reference_pivot(df_raw.copy()))
+
+
+def seed_collections(db, seed):
+    rnd = random.Random(seed)
+    subjects = [{"_id": ObjectId(), "name": f"Subject {i}"} for i in range(4)]
+    exams = [
+        {"_id": ObjectId(), "title": f"Exam {i}", "subject": s["_id"]}
+        for i, s in enumerate(subjects * 2)
+    ]
+    # an exam whose subject is gone
+    exams.append({"_id": ObjectId(), "title": "Orphan", "subject": ObjectId()})
+    users = [
+        {"_id": ObjectId(), "firstName": f"First{i}", "lastName": f"Last{i}"}
+        for i in range(30)
+    ]
+    users.append({"_id": ObjectId(), "firstName": "", "lastName": None})
+    db[main.SUBJECTS_COLLECTION].insert_many(subjects)
+    db[main.EXAMS_COLLECTION].insert_many(exams)
+    db[main.USERS_COLLECTION].insert_many(users)
+
+    created = datetime.datetime(2026, 1, 1)
+    results = []
+    for _ in range(300):
+        result = {
+            # missing joins: unknown exam, unknown student
+            "examId": rnd.choice(exams)["_id"] if rnd.random() > 0.05 else ObjectId(),
+            "studentId": (
+                rnd.choice(users[1:])["_id"] if rnd.random() > 0.05 else ObjectId()
+            ),
+            "totalMarksObtained": rnd.randint(0, 50),
+            "totalMaxMarks": rnd.choice([0, 50, 100]),
+            "createdAt": created,
+            "updatedAt": created,
+        }
+        if rnd.random() < 0.05:
+            del result["totalMaxMarks"]
+        if rnd.random() < 0.05:
+            del result["totalMarksObtained"]
+        results.append(result)
+    # a student whose every result has zero max marks
+    results += [
+        {
+            "examId": exam["_id"],
+            "studentId": users[0]["_id"],
+            "totalMarksObtained": 10,
+            "totalMaxMarks": 0,
+            "createdAt": created,
+            "updatedAt": created,
+        }
+        for exam in exams[:3]
+    ]
+    db[main.EXAMRESULTS_COLLECTION].insert_many(results)
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_load_data_from_mongo_matches_reference(mongo, seed):
+    seed_collections(mongo, seed)
+    df, subjects = main.load_data_from_mongo()
+    assert ((df["MaxTotal"] == 0) & (df["Percentage"] == 0)).any()
+    assert (df["Name"] == "Unknown Student").any()
+    assert "Unknown" in df.columns
+    assert_pivots_equal(
+        (df, subjects), reference_load(mongo[main.EXAMRESULTS_COLLECTION])
+    )
@@ -0,0 +1,85 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import numpy as np
+import pandas as pd
+
+import main
+
+# A request that waited for the rebuild would take BUILD_SECONDS
+BUILD_SECONDS = 20
+REPORT_LATENCY_BOUND = 1.0
+
+
+def sample_analyzer(n_students=300, seed=0):
+    rng = np.random.default_rng(seed)
+    subjects = [f"Subject {i}" for i in range(4)]
+    df = pd.DataFrame(
+        {
+            "StudentID": [f"{i:024x}" for i in range(n_students)],
+            "Name": [f"First{i} Last{i}" for i in range(n_students)],
+        }
+    )
+    for s in subjects:
+        df[s] = rng.integers(0, 101, n_students).astype(float)
+    df["Total"] = df[subjects].sum(axis=1)
+    df["MaxTotal"] = 100.0 * len(subjects)
+    df["Percentage"] = df["Total"] / df["MaxTotal"] * 100
+    df["Status"] = np.where(df["Percentage"] < 40, "Fail", "Pass")
+    return main.PerformanceAnalyzer(df, subjects=subjects)
+
+
+def test_reports_are_served_while_a_rebuild_runs(mongo, monkeypatch):
+    analyzer = sample_analyzer()
+    student_ids = analyzer.df["StudentID"].astype(str).tolist()
+    building, release = threading.Event(), threading.Event()
+    builds = []
+
+    def slow_builder():
+        # the rebuild started by the test blocks until the test releases it
+        if len(builds) == 1:
+            building.set()
+            release.wait(BUILD_SECONDS)
+        builds.append(time.monotonic())
+        return analyzer, None
+
+    manager = main.SnapshotManager(slow_builder, ttl=3600, poll_interval=0)
+    monkeypatch.setattr(main, "snapshot_manager", manager)
+    manager.refresh()
+
+    async def timed_reports():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as c:
+            # first render pays for template compilation and plotly imports
+            assert (await c.get(f"/report/{student_ids[0]}")).status_code == 200
+            rebuild.start()
+            assert building.wait(5)
+
+            async def report(sid):
+                main.response_cache.clear()
+                started = time.perf_counter()
+                response = await c.get(f"/report/{sid}")
+                assert response.status_code == 200
+                return time.perf_counter() - started
+
+            latencies = [await report(sid) for sid in student_ids[1:11]]
+            started = time.perf_counter()
+            await asyncio.gather(*(report(sid) for sid in student_ids[11:19]))
+            return latencies, time.perf_counter() - started
+
+    rebuild = threading.Thread(target=manager.refresh)
+    try:
+        latencies, concurrent_seconds = asyncio.run(timed_reports())
+        still_building = rebuild.is_alive()
+    finally:
+        release.set()
+        rebuild.join()
+        manager.stop()
+
+    assert max(latencies) < REPORT_LATENCY_BOUND, latencies
+    assert concurrent_seconds < 8 * REPORT_LATENCY_BOUND
+    assert still_building, "the rebuild finished before the requests were timed"
+    # requests read the published snapshot; only the test's rebuild ran
+    assert len(builds) == 2 and manager.get().version == 2